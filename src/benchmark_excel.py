@@ -0,0 +1,154 @@
+"""Benchmark cho các đường I/O Excel (save_assignments_to_excel, combine_excels).
+
+    python benchmark_excel.py                      # 1k / 10k / 100k dòng, 4 file group
+    python benchmark_excel.py --rows 1000 10000 --groups 8
+    python benchmark_excel.py --compare ../bench/excel_20251018_101500.json
+
+Kết quả ghi ra bench/excel_<timestamp>.json để so sánh giữa các lần đổi code.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+from excel_helper import save_assignments_to_excel, combine_excels
+from module import get_mp4_filename
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BASE_DIR, "bench")
+
+
+def make_plan(n_rows, n_groups, n_channels=50):
+    """Plan giả: list[(group, rows)] chia đều n_rows cho n_groups file."""
+    groups = []
+    k = 0
+    for g in range(n_groups):
+        rows = []
+        per_group = n_rows // n_groups + (1 if g < n_rows % n_groups else 0)
+        for i in range(per_group):
+            k += 1
+            rows.append((
+                f"P-{g:02d}-{i % n_channels:04d}",
+                f"E:\\storage\\group{g}\\{k}G.mp4",
+                f"Synthetic short title number {k} #shorts",
+                "Synthetic description line for benchmark purposes. " * 3,
+                "10/18/2025",
+                f"{(i // 60) % 24:02d}:{i % 60:02d}",
+            ))
+        groups.append((f"group{g:02d}", rows))
+    return groups
+
+
+def _measure(fn, memory):
+    if memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_size(n_rows, n_groups, workers, memory):
+    plan = make_plan(n_rows, n_groups)
+    work = tempfile.mkdtemp(prefix="bench_excel_")
+    try:
+        in_dir = os.path.join(work, "upload")
+        os.makedirs(in_dir)
+        out_file = os.path.join(work, "upload_data.xlsx")
+
+        def save_all():
+            for name, rows in plan:
+                save_assignments_to_excel(rows, os.path.join(in_dir, f"{name}.xlsx"))
+
+        def combine(max_workers=workers):
+            combine_excels(in_dir, out_file, "E:\\moved", get_mp4_filename, max_workers=max_workers)
+
+        results = []
+        # đo thời gian không bật tracemalloc (tracemalloc làm chậm nhiều lần)
+        save_s, _ = _measure(save_all, False)
+        combine_s, _ = _measure(combine, False)
+        save_mb = combine_mb = None
+        if memory:
+            _, save_mb = _measure(save_all, True)
+            # tracemalloc chỉ thấy process hiện tại -> đo bộ nhớ combine với parse trong cùng process
+            _, combine_mb = _measure(lambda: combine(1), True)
+
+        total = sum(len(rows) for _, rows in plan)
+        results.append({"op": "save", "rows": total, "files": n_groups,
+                        "seconds": round(save_s, 4), "peak_mb": save_mb and round(save_mb, 2)})
+        results.append({"op": "combine", "rows": total, "files": n_groups,
+                        "seconds": round(combine_s, 4), "peak_mb": combine_mb and round(combine_mb, 2)})
+        return results
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    prev = {(r["op"], r["rows"], r["files"]): r for r in previous.get("results", [])}
+    print(f"\nSo sánh với {previous_path}:")
+    for r in current["results"]:
+        p = prev.get((r["op"], r["rows"], r["files"]))
+        if not p:
+            continue
+        ratio = r["seconds"] / p["seconds"] if p["seconds"] else float("inf")
+        print(f"  {r['op']:<8} {r['rows']:>7} rows: {p['seconds']:.3f}s -> {r['seconds']:.3f}s (x{ratio:.2f})")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--groups", type=int, default=4, help="số file group trong upload/")
+    ap.add_argument("--workers", type=int, default=None, help="max_workers cho combine_excels")
+    ap.add_argument("--no-memory", action="store_true", help="bỏ đo peak memory (tracemalloc)")
+    ap.add_argument("--out", default=None, help="file JSON kết quả")
+    ap.add_argument("--compare", default=None, help="file JSON của lần chạy trước")
+    args = ap.parse_args(argv)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "openpyxl": openpyxl.__version__,
+            "platform": platform.platform(),
+            "groups": args.groups,
+            "workers": args.workers,
+            # peak_mb: tracemalloc của process chính; combine đo riêng với max_workers=1
+            # (parse chạy trong process chính) vì tracemalloc không thấy process con
+            "memory_method": None if args.no_memory else "tracemalloc, combine max_workers=1",
+        },
+        "results": [],
+    }
+    for n in args.rows:
+        for r in bench_size(n, args.groups, args.workers, not args.no_memory):
+            report["results"].append(r)
+            mem = f", peak {r['peak_mb']} MB" if r["peak_mb"] is not None else ""
+            print(f"{r['op']:<8} {r['rows']:>7} rows / {r['files']} files: {r['seconds']:.3f}s{mem}")
+
+    out = args.out
+    if not out:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        out = os.path.join(BENCH_DIR, f"excel_{stamp}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Saved: {out}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
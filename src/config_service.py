@@ -0,0 +1,195 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+STAT_INTERVAL = 1.0   # giây; trong khoảng này không stat lại file (preview gõ phím không đụng đĩa)
+WRITE_DELAY = 0.5     # giây; các lần ghi liên tiếp được gom thành 1 lần ghi file
+
+
+def parse_group_dirs(text: str) -> dict:
+    """config_dir: mỗi dòng 'group:path' -> {group: path} (giữ nguyên chuỗi gốc)."""
+    raw = {}
+    for line in text.splitlines():
+        if ":" not in line:
+            continue
+        name, path = line.strip().split(":", 1)
+        raw[name.strip()] = path.strip()
+    return raw
+
+
+def dump_group_dirs(raw: dict) -> str:
+    lines = [f"{k}:{v}" for k, v in raw.items()]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def normalize_group_dirs(raw: dict) -> dict:
+    group_to_dir = {}
+    for name, path in raw.items():
+        # -- chuẩn hóa khóa: bỏ .csv
+        key = os.path.splitext(name)[0]
+        # -- chuẩn hóa path
+        norm_path = os.path.abspath(path.replace("\\", "/"))
+        group_to_dir[key] = norm_path
+        # (tùy chọn) giữ thêm khóa cũ để tương thích 2 chiều
+        group_to_dir[key + ".csv"] = norm_path
+    return group_to_dir
+
+
+def _parse_json(text: str) -> dict:
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _dump_json(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+class _CachedFile:
+    """1 file dict trong RAM; đọc lại khi (mtime, size) đổi, ghi trễ và ghi nguyên tử."""
+
+    def __init__(self, path, parse, dump):
+        self.path = path
+        self._parse = parse
+        self._dump = dump
+        self.data = {}
+        self.version = 0        # tăng mỗi lần data đổi (để cache các view dẫn xuất)
+        self._stat = None
+        self._checked = 0.0
+        self._pending = {}      # key -> value, None = xóa; chưa ghi xuống đĩa
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def check(self, force=False):
+        now = time.monotonic()
+        if not force and self.version and now - self._checked < STAT_INTERVAL:
+            return
+        self._checked = now
+        st = self._file_stat()
+        if st == self._stat and self.version:
+            return
+        self._stat = st
+        text = ""
+        if st is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                text = ""
+        data = self._parse(text)
+        # thay đổi chưa ghi vẫn được ưu tiên hơn nội dung trên đĩa
+        self._apply(data, self._pending)
+        self.data = data
+        self.version += 1
+
+    @staticmethod
+    def _apply(data, changes):
+        for k, v in changes.items():
+            if v is None:
+                data.pop(k, None)
+            else:
+                data[k] = v
+
+    def set(self, changes: dict):
+        self._pending.update(changes)
+        data = dict(self.data)
+        self._apply(data, changes)
+        self.data = data
+        self.version += 1
+
+    def flush(self):
+        if not self._pending:
+            return
+        # đọc lại file trước khi ghi để không đè thay đổi từ process khác
+        self.check(force=True)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self._dump(self.data))
+        os.replace(tmp, self.path)
+        self._pending = {}
+        self._stat = self._file_stat()
+        self._checked = time.monotonic()
+
+
+class ConfigService:
+    """Giữ config.json (group -> thư mục lưu) và config_dir (group -> thư mục video) trong RAM.
+
+    Đọc: không I/O, chỉ stat lại file tối đa mỗi STAT_INTERVAL giây và parse lại khi mtime đổi.
+    Ghi: cập nhật RAM ngay, file được ghi gộp sau WRITE_DELAY giây (hoặc flush()/thoát app).
+    Lỗi khi ghi nền được giữ lại (thay đổi chưa ghi vẫn còn, flush() sau sẽ thử lại) và báo
+    qua on_error(exc) nếu có; flush() gọi trực tiếp thì ném lỗi ra như bình thường.
+    """
+
+    def __init__(self, config_file: str, dir_map_file: str, on_error=None):
+        self._lock = threading.RLock()
+        self._config = _CachedFile(config_file, _parse_json, _dump_json)
+        self._dirs = _CachedFile(dir_map_file, parse_group_dirs, dump_group_dirs)
+        self._dirs_view = (None, {})
+        self._timer = None
+        self.on_error = on_error
+        atexit.register(self.flush)
+
+    # ---------- đọc ----------
+    def group_dirs(self) -> dict:
+        """{group: abs_path} kèm khóa 'group.csv'. Dict dùng chung, không sửa trực tiếp."""
+        with self._lock:
+            self._dirs.check()
+            version, view = self._dirs_view
+            if version != self._dirs.version:
+                view = normalize_group_dirs(self._dirs.data)
+                self._dirs_view = (self._dirs.version, view)
+            return view
+
+    def group_config(self, group_name: str) -> str:
+        with self._lock:
+            self._config.check()
+            return self._config.data.get(group_name, "")
+
+    # ---------- ghi ----------
+    def set_group_config(self, group_name: str, move_folder: str):
+        with self._lock:
+            self._config.check()
+            self._config.set({group_name: move_folder})
+            self._schedule_flush()
+
+    def set_group_dir(self, group_name: str, folder: str):
+        """Map group -> thư mục video; bỏ mapping cũ dạng 'group' lẫn 'group.csv'."""
+        with self._lock:
+            self._dirs.check()
+            changes = {k: None for k in (group_name, f"{group_name}.csv") if k in self._dirs.data}
+            # xóa rồi thêm lại để dòng mới nằm cuối file như trước
+            self._dirs.set(changes)
+            self._dirs.set({group_name: folder})
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(WRITE_DELAY, self._flush_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._config.flush()
+            self._dirs.flush()
@@ -1,45 +1,65 @@
 import os
+import csv
+import time
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
+from openpyxl.cell import WriteOnlyCell
 
-def save_assignments_to_excel(assignments, out_path):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Assignments"
-
-    headers = ["channel", "directory", "title", "description", "publish_date", "publish_time"]
-    ws.append(headers)
-    for col_idx, h in enumerate(headers, start=1):
-        ws.cell(row=1, column=col_idx).font = Font(bold=True)
+HEADERS = ["channel", "directory", "title", "description", "publish_date", "publish_time"]
 
-    for row in assignments:
-        ws.append(row)
 
-    # Auto width
-    desc_idx = headers.index("description") + 1
-    for col_idx in range(1, ws.max_column + 1):
-        col_letter = get_column_letter(col_idx)
-        max_len = 0
-        for row in ws.iter_rows(min_row=1, max_row=ws.max_row,
-                                min_col=col_idx, max_col=col_idx):
-            val = row[0].value
+def _column_widths(headers, rows):
+    """Độ rộng cột tính trong 1 lượt duyệt giá trị (không tạo cell object)."""
+    desc_idx = headers.index("description") if "description" in headers else -1
+    max_lens = [len(h) for h in headers]
+    for row in rows:
+        for i, val in enumerate(row[:len(headers)]):
             if val is None:
                 continue
-            s = str(val)
-            if col_idx == desc_idx:
-                s = s[:120]
-            max_len = max(max_len, len(s))
-
-        header_name = headers[col_idx - 1]
-        if header_name in ("publish_date", "publish_time"):
-            ws.column_dimensions[col_letter].width = max(12, min(max_len + 2, 18))
+            n = len(str(val))
+            if i == desc_idx:
+                n = min(n, 120)
+            if n > max_lens[i]:
+                max_lens[i] = n
+
+    widths = []
+    for h, max_len in zip(headers, max_lens):
+        if h in ("publish_date", "publish_time"):
+            widths.append(max(12, min(max_len + 2, 18)))
         else:
-            ws.column_dimensions[col_letter].width = min(max_len + 2, 80)
+            widths.append(min(max_len + 2, 80))
+    return widths
+
 
-    ws.auto_filter.ref = ws.dimensions
+def save_assignments_to_excel(assignments, out_path):
+    # openpyxl write-only ghi <cols> trước dữ liệu nên độ rộng phải có trước khi stream;
+    # tính trên giá trị Python 1 lượt rồi ghi thẳng ra file, không giữ cell trong RAM
+    rows = assignments if isinstance(assignments, (list, tuple)) else list(assignments)
+    headers = HEADERS
+    widths = _column_widths(headers, rows)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Assignments")
+    for col_idx, w in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = w
     ws.freeze_panes = "A2"
 
+    header_cells = []
+    for h in headers:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for row in rows:
+        ws.append(row)
+
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{len(rows) + 1}"
+
     # Ghi đè nếu tồn tại
     if os.path.exists(out_path):
         os.remove(out_path)
@@ -48,64 +68,344 @@ def save_assignments_to_excel(assignments, out_path):
     return out_path
 
 
-def combine_excels(input_dir, output_file, move_folder, get_mp4_filename):
+def save_assignments_to_csv(assignments, out_path):
+    with open(out_path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(HEADERS)
+        w.writerows(assignments)
+    return out_path
+
+
+def save_assignments_to_jsonl(assignments, out_path):
+    with open(out_path, "w", encoding="utf-8") as f:
+        for row in assignments:
+            f.write(json.dumps(dict(zip(HEADERS, row)), ensure_ascii=False) + "\n")
+    return out_path
+
+
+def save_assignments_to_parquet(assignments, out_path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Xuất parquet cần cài pyarrow (pip install pyarrow)")
+
+    columns = [[] for _ in HEADERS]
+    for row in assignments:
+        for i, col in enumerate(columns):
+            v = row[i] if i < len(row) else None
+            col.append(None if v is None else str(v))
+    table = pa.table({h: pa.array(col, type=pa.string()) for h, col in zip(HEADERS, columns)})
+    pq.write_table(table, out_path)
+    return out_path
+
+
+# định dạng xuất -> hàm ghi (assignments, out_path)
+EXPORT_WRITERS = {
+    "xlsx": save_assignments_to_excel,
+    "csv": save_assignments_to_csv,
+    "jsonl": save_assignments_to_jsonl,
+    "parquet": save_assignments_to_parquet,
+}
+
+
+def save_assignments(assignments, out_path, fmt=None):
+    """Ghi plan theo định dạng `fmt` (mặc định lấy theo đuôi file)."""
+    fmt = (fmt or os.path.splitext(out_path)[1].lstrip(".") or "xlsx").lower()
+    writer = EXPORT_WRITERS.get(fmt)
+    if writer is None:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return writer(assignments, out_path)
+
+
+def _iter_plan_rows(file):
+    """(header, generator các dòng) của 1 file plan, đọc read-only theo stream."""
+    wb = load_workbook(file, read_only=True)
+    ws = wb.active
+    it = ws.iter_rows(values_only=True)
+    header = next(it, None) or ()
+
+    def rows():
+        try:
+            for row in it:
+                if row and any(v is not None for v in row):
+                    yield row
+        finally:
+            wb.close()
+
+    return list(header), rows()
+
+
+def _write_header_only(file, header):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Assignments")
+    ws.freeze_panes = "A2"
+    cells = []
+    for h in header:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    ws.append(cells)
+    wb.save(file)
+
+
+def _parse_plan_file(file):
+    """Chạy trong process con: đọc hết 1 file plan. Trả về (file, header, rows, giây)."""
+    t0 = time.perf_counter()
+    header, rows = _iter_plan_rows(file)
+    rows = list(rows)
+    return file, header, rows, time.perf_counter() - t0
+
+
+def _group_sort_key(file):
+    return os.path.splitext(os.path.basename(file))[0].lower()
+
+
+def _manifest_path(output_file):
+    return os.path.splitext(output_file)[0] + ".manifest.json"
+
+
+def _load_manifest(output_file):
+    """Manifest của file gộp; None nếu thiếu/hỏng/cũ hoặc file gộp đã bị sửa từ lần ghi trước."""
+    path = _manifest_path(output_file)
+    if not os.path.exists(output_file) or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or "rows" not in manifest:
+        return None
+    if manifest.get("output") != _file_stat(output_file):
+        return None
+    return manifest
+
+
+def _seed_manifest(output_file):
+    """Dựng manifest từ chính file gộp đang có (không rõ group -> khớp theo directory)."""
+    header, rows = _iter_plan_rows(output_file)
+    lower = [str(h or "").strip().lower() for h in header]
+    dir_idx = lower.index("directory") if "directory" in lower else 1
+    entries = []
+    for row in rows:
+        directory = str(row[dir_idx] or "").strip() if dir_idx < len(row) else ""
+        entries.append([None, directory or None, None])
+    return {"header": header, "rows": entries, "files": {}}
+
+
+def _save_manifest(output_file, header, entries, file_stats):
+    path = _manifest_path(output_file)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"header": header, "rows": entries, "files": file_stats,
+                   "output": _file_stat(output_file)}, f)
+    os.replace(tmp, path)
+
+
+def _row_hash(group, row):
+    data = json.dumps([group] + [None if v is None else str(v) for v in row], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _row_key(row, row_hash):
+    """Khóa của 1 dòng trong group: directory (video); dòng chưa có video thì theo nội dung."""
+    directory = str(row[1] or "").strip() if len(row) > 1 else ""
+    return directory or "#" + row_hash
+
+
+def _file_stat(file):
+    st = os.stat(file)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def combine_excels(input_dir, output_file, move_folder, get_mp4_filename, max_workers=None,
+                   incremental=False):
+    """Gộp các file upload/*.xlsx thành 1 file.
+
+    Các file được parse song song bằng process pool, ghép theo thứ tự tên group.
+    <output>.manifest.json ghi (group, directory, hash) của từng dòng trong file gộp.
+
+    incremental=True: giữ nguyên các dòng đã có trong file gộp và không xóa dữ liệu file gốc;
+    dòng mới được nối thêm, dòng cùng (group, directory) mà đổi nội dung (vd. Apply date/time
+    rồi Save lại) thì thay tại chỗ. File gộp có sẵn mà thiếu manifest thì dựng manifest từ nó.
+    Trả về (số file, list file, list[(file, số dòng mới/đổi, giây parse)]).
+    """
     import glob
     pattern = os.path.join(input_dir, "*.xlsx")
-    files = glob.glob(pattern)
+    files = sorted(glob.glob(pattern), key=_group_sort_key)
     if not files:
-        return 0, []  # không có file
-
-    wb_out = Workbook()
-    ws_out = wb_out.active
-    ws_out.title = "Combined"
+        return 0, [], []  # không có file
 
-    header_written = False
-    row_idx = 1
-    processed_files = []
+    manifest = None
+    if incremental:
+        manifest = _load_manifest(output_file)
+        if manifest is None and os.path.exists(output_file):
+            manifest = _seed_manifest(output_file)
+    entries = [list(e) for e in manifest["rows"]] if manifest else []
+    index = {(g, k): i for i, (g, k, _) in enumerate(entries) if k is not None}
+    base = len(entries)   # số dòng đang có trong file gộp
+    old_stats = manifest.get("files", {}) if manifest else {}
+    file_stats = {os.path.abspath(f): _file_stat(f) for f in files}
 
-    for file in files:
-        wb = load_workbook(file)
-        ws = wb.active
+    # file không đổi từ lần gộp trước thì khỏi parse
+    to_parse = [f for f in files if old_stats.get(os.path.abspath(f)) != file_stats[os.path.abspath(f)]]
 
-        max_row = ws.max_row
-        max_col = ws.max_column
+    workers = max_workers or min(len(to_parse), os.cpu_count() or 1)
+    if workers > 1 and len(to_parse) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parsed = list(ex.map(_parse_plan_file, to_parse))  # map giữ đúng thứ tự files
+    else:
+        parsed = [_parse_plan_file(f) for f in to_parse]
 
-        if not header_written:
+    header = manifest["header"] if manifest else None
+    headers = {}
+    timings = []
+    new_rows = []
+    replaced = {}   # vị trí dòng trong file gộp cũ -> dòng thay thế
+    for file, file_header, rows, elapsed in parsed:
+        headers[file] = file_header
+        if header is None:
             # copy header gốc
-            for col in range(1, max_col + 1):
-                ws_out.cell(row=1, column=col).value = ws.cell(row=1, column=col).value
-            ws_out.cell(row=1, column=max_col + 1).value = "move_folder"
-            header_written = True
-            row_idx += 1
-
-        for r in range(2, max_row + 1):
-            row_values = [ws.cell(row=r, column=c).value for c in range(1, max_col + 1)]
-
+            header = file_header + ["move_folder"]
+        group = _group_sort_key(file)
+        added = 0
+        for row_values in rows:
+            h = _row_hash(group, row_values)
+            key = _row_key(row_values, h)
+            i = index.get((group, key))
+            if i is None and not key.startswith("#"):
+                # dòng dựng từ file gộp cũ (không rõ group) khớp theo directory
+                i = index.pop((None, key), None)
+            if i is not None and entries[i][2] == h:
+                continue
             directory_val = row_values[1] if len(row_values) > 1 else ""
             filename = get_mp4_filename(directory_val)
             move_path = os.path.join(move_folder, filename) if filename else ""
+            out_row = list(row_values) + [move_path]
+            if i is None:
+                i = len(entries)
+                entries.append([group, key, h])
+                new_rows.append(out_row)
+            else:
+                entries[i] = [group, key, h]
+                if i < base:
+                    replaced[i] = out_row
+                else:
+                    new_rows[i - base] = out_row
+            index[(group, key)] = i
+            added += 1
+        timings.append((file, added, elapsed))
 
-            for c, val in enumerate(row_values, start=1):
-                ws_out.cell(row=row_idx, column=c).value = val
-            ws_out.cell(row=row_idx, column=max_col + 1).value = move_path
+    if manifest and not new_rows and not replaced:
+        _save_manifest(output_file, header, entries, file_stats)
+        return len(files), files, timings
 
-            row_idx += 1
+    wb_out = Workbook(write_only=True)
+    ws_out = wb_out.create_sheet("Combined")
+    ws_out.append(header)
+    if manifest:
+        # chép lại các dòng đã gộp (stream), thay dòng đã đổi, rồi nối dòng mới
+        _, old_rows = _iter_plan_rows(output_file)
+        for i, row in enumerate(old_rows):
+            ws_out.append(replaced.get(i, row))
+    for row in new_rows:
+        ws_out.append(row)
 
-        processed_files.append(file)
-
-    # lưu file gộp
+    # lưu file gộp (ghi ra file tạm rồi thay thế)
     os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
-    if os.path.exists(output_file):
-        os.remove(output_file)
-    wb_out.save(output_file)
-
-    # xóa dữ liệu trong file gốc
-    for file in processed_files:
-        wb = load_workbook(file)
-        ws = wb.active
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=ws.max_column):
-            for cell in row:
-                cell.value = None
-        wb.save(file)
-
-    return len(processed_files), processed_files
\ No newline at end of file
+    tmp_output = output_file + ".tmp.xlsx"
+    wb_out.save(tmp_output)
+    os.replace(tmp_output, output_file)
+
+    if not incremental:
+        # xóa dữ liệu trong file gốc: chỉ ghi lại dòng header
+        for file in files:
+            _write_header_only(file, headers[file])
+            file_stats[os.path.abspath(file)] = _file_stat(file)
+    _save_manifest(output_file, header, entries, file_stats)
+
+    return len(files), files, timings
+
+
+def _time_bucket(date_val, time_val):
+    """(ngày, giờ) đăng của 1 dòng, None nếu không có giờ."""
+    t = str(time_val or "").strip()
+    if ":" not in t:
+        return None
+    hour = t.split(":", 1)[0].strip()
+    return (str(date_val or "").strip(), hour)
+
+
+def shard_rows(rows, k, channel_idx=0, date_idx=None, time_idx=None):
+    """Chia plan thành k shard, mỗi channel/profile chỉ nằm trong đúng 1 shard.
+
+    Channel nhiều dòng xếp trước (LPT); mỗi channel vào shard có chi phí nhỏ nhất =
+    số dòng của shard + mức trùng khung giờ đăng với các dòng đã có trong shard.
+    Trả về list k shard (list dòng, giữ thứ tự gốc trong từng shard).
+    """
+    k = max(1, int(k))
+    by_channel = {}
+    for pos, row in enumerate(rows):
+        ch = row[channel_idx] if channel_idx < len(row) else None
+        by_channel.setdefault(ch, []).append(pos)
+
+    def buckets(positions):
+        hist = {}
+        if time_idx is None:
+            return hist
+        for pos in positions:
+            row = rows[pos]
+            b = _time_bucket(row[date_idx] if date_idx is not None and date_idx < len(row) else "",
+                             row[time_idx] if time_idx < len(row) else "")
+            if b is not None:
+                hist[b] = hist.get(b, 0) + 1
+        return hist
+
+    loads = [0] * k
+    shard_hist = [{} for _ in range(k)]
+    shard_pos = [[] for _ in range(k)]
+    for ch, positions in sorted(by_channel.items(), key=lambda kv: (-len(kv[1]), str(kv[0]))):
+        cnt = len(positions)
+        hist = buckets(positions)
+        best, best_cost = 0, None
+        for s in range(k):
+            collision = sum(shard_hist[s].get(b, 0) * n for b, n in hist.items())
+            cost = loads[s] + cnt + collision / cnt
+            if best_cost is None or cost < best_cost:
+                best, best_cost = s, cost
+        loads[best] += cnt
+        for b, n in hist.items():
+            shard_hist[best][b] = shard_hist[best].get(b, 0) + n
+        shard_pos[best].extend(positions)
+
+    return [[rows[p] for p in sorted(positions)] for positions in shard_pos]
+
+
+def shard_combined_excel(input_file, k, out_dir=None):
+    """Tách upload_data.xlsx thành k file upload_data_shard_<i>.xlsx cho k GPM runner chạy song song."""
+    header, rows = _iter_plan_rows(input_file)
+    rows = list(rows)
+    lower = [str(h or "").strip().lower() for h in header]
+
+    def col(name, default=None):
+        return lower.index(name) if name in lower else default
+
+    shards = shard_rows(rows, k, channel_idx=col("channel", 0),
+                        date_idx=col("publish_date"), time_idx=col("publish_time"))
+
+    out_dir = out_dir or os.path.dirname(input_file) or "."
+    base = os.path.splitext(os.path.basename(input_file))[0]
+    paths = []
+    for i, shard in enumerate(shards, start=1):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Combined")
+        ws.append(header)
+        for row in shard:
+            ws.append(row)
+        out_path = os.path.join(out_dir, f"{base}_shard_{i}.xlsx")
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        wb.save(out_path)
+        paths.append((out_path, len(shard)))
+    return paths
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_SIZE = 64 * 1024   # đọc 3 đoạn 64KB: đầu / giữa / cuối file
+MAX_WORKERS = 8
+
+
+def compute_fingerprint(path: str) -> str:
+    """Dấu vân tay nhanh của file: size + blake2b của vài đoạn mẫu (không đọc hết file)."""
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= 3 * SAMPLE_SIZE:
+            h.update(f.read())
+        else:
+            for offset in (0, size // 2 - SAMPLE_SIZE // 2, size - SAMPLE_SIZE):
+                f.seek(offset)
+                h.update(f.read(SAMPLE_SIZE))
+    return f"{size:x}-{h.hexdigest()}"
+
+
+def _stat_and_hash(path):
+    try:
+        st = os.stat(path)
+        return path, st.st_mtime_ns, st.st_size, compute_fingerprint(path)
+    except OSError:
+        return path, None, None, None
+
+
+class FingerprintCache:
+    """Cache fingerprint theo (path, mtime, size) trong SQLite; file mới được hash song song."""
+
+    def __init__(self, db_path: str, max_workers: int = MAX_WORKERS):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._conn = None
+        self._mem = {}  # path -> (mtime_ns, size, fp)
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                " path TEXT PRIMARY KEY,"
+                " mtime_ns INTEGER,"
+                " size INTEGER,"
+                " fp TEXT)"
+            )
+            for path, mtime_ns, size, fp in conn.execute("SELECT path, mtime_ns, size, fp FROM fingerprints"):
+                self._mem[path] = (mtime_ns, size, fp)
+            self._conn = conn
+        return self._conn
+
+    def get(self, path: str):
+        return self.get_many([path]).get(path)
+
+    def get_many(self, paths) -> dict:
+        """path -> fingerprint (None nếu file không đọc được)."""
+        out = {}
+        misses = []
+        with self._lock:
+            self._db()
+            for p in dict.fromkeys(paths):
+                if not p:
+                    continue
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    out[p] = None
+                    continue
+                cached = self._mem.get(p)
+                if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    out[p] = cached[2]
+                else:
+                    misses.append(p)
+
+        if not misses:
+            return out
+
+        if len(misses) == 1:
+            results = [_stat_and_hash(misses[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+                results = list(ex.map(_stat_and_hash, misses))
+
+        with self._lock:
+            conn = self._db()
+            rows = []
+            for path, mtime_ns, size, fp in results:
+                out[path] = fp
+                if fp is not None:
+                    self._mem[path] = (mtime_ns, size, fp)
+                    rows.append((path, mtime_ns, size, fp))
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)", rows)
+        return out
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,123 @@
+import os
+import threading
+from random_vids import get_folder_index
+
+try:  # inotify/ReadDirectoryChangesW qua watchdog nếu có cài, không thì poll
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+POLL_INTERVAL = 5.0         # giây, khi chỉ có polling
+WATCHDOG_POLL_INTERVAL = 60.0  # có watchdog thì poll thưa, chỉ để phòng sót event
+
+
+class _WakeHandler(FileSystemEventHandler):
+    def __init__(self, watcher, key):
+        self.watcher = watcher
+        self.key = key
+
+    def on_any_event(self, event):
+        # file đổi tên thành .mp4 (x.tmp -> x.mp4, cách nhiều tool copy/tải ghi file) chỉ có ở dest_path
+        paths = (event.src_path, getattr(event, "dest_path", "") or "")
+        if event.is_directory or any(p.lower().endswith(".mp4") for p in paths):
+            self.watcher.touch(*self.key)
+
+
+class FolderWatcher(threading.Thread):
+    """Thread nền giữ FolderIndex của các thư mục luôn mới, để preview/concat không phải quét."""
+
+    def __init__(self, interval: float = None):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self._folders = set()   # {(abs_path, recursive)}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._watches = {}
+
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception:
+                self._observer = None
+
+    def set_folders(self, folders, recursive=False):
+        keys = {(os.path.abspath(f), recursive) for f in folders if f}
+        with self._lock:
+            removed = self._folders - keys
+            added = keys - self._folders
+            self._folders = keys
+            self._dirty |= added
+        for key in removed:
+            self._unwatch(key)
+        for key in added:
+            self._watch(key)
+        self._wake.set()
+
+    def add_folder(self, folder, recursive=False):
+        key = (os.path.abspath(folder), recursive)
+        with self._lock:
+            if key in self._folders:
+                return
+            self._folders.add(key)
+            self._dirty.add(key)
+        self._watch(key)
+        self._wake.set()
+
+    def touch(self, folder, recursive=False):
+        """Đánh dấu thư mục cần quét lại ngay (vd. vừa chọn group)."""
+        with self._lock:
+            self._dirty.add((os.path.abspath(folder), recursive))
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+    def _watch(self, key):
+        if self._observer is None or not os.path.isdir(key[0]):
+            return
+        try:
+            self._watches[key] = self._observer.schedule(_WakeHandler(self, key), key[0], recursive=key[1])
+        except Exception:
+            pass
+
+    def _unwatch(self, key):
+        watch = self._watches.pop(key, None)
+        if watch is not None and self._observer is not None:
+            try:
+                self._observer.unschedule(watch)
+            except Exception:
+                pass
+
+    def run(self):
+        if self.interval is None:
+            self.interval = WATCHDOG_POLL_INTERVAL if self._observer is not None else POLL_INTERVAL
+
+        while not self._stopped.is_set():
+            self._wake.clear()
+            with self._lock:
+                dirty = self._dirty
+                self._dirty = set()
+                folders = list(self._folders)
+
+            # thư mục được touch quét trước, sau đó poll mtime các thư mục còn lại
+            for folder, recursive in list(dirty) + [k for k in folders if k not in dirty]:
+                if self._stopped.is_set():
+                    return
+                try:
+                    get_folder_index(folder, recursive)
+                except OSError:
+                    continue
+                if self._dirty:
+                    break  # có yêu cầu mới -> làm ngay
+
+            self._wake.wait(self.interval)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+
+CACHE_VERSION = 1        # tăng khi đổi lệnh normalize để bỏ cache cũ
+DEFAULT_MAX_GB = 20.0
+
+
+def params_key(params: dict) -> str:
+    raw = json.dumps({"v": CACHE_VERSION, **params}, sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+class ClipCache:
+    """Cache clip đã normalize trên đĩa, khóa = fingerprint nguồn + tham số encode.
+
+    Mỗi clip là 1 file <fingerprint>_<params>.mp4; mtime của file là lần dùng cuối (LRU).
+    Khi tổng dung lượng vượt max_bytes, trim() xóa clip lâu không dùng nhất (trừ clip đang được pin).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, fingerprinter):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self._fingerprint = fingerprinter   # path -> fingerprint (None nếu không đọc được)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._pins = Counter()              # path clip đang dùng -> số lần pin
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, src: str, params: dict):
+        fp = self._fingerprint(src)
+        return f"{fp}_{params_key(params)}" if fp else None
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def get_or_create(self, src: str, params: dict, produce) -> str:
+        """Path clip normalize của `src`; chưa có thì gọi produce(src, out_path, **params).
+
+        Clip trả về được pin cho tới khi release(), để trim() không xóa mất giữa lúc concat.
+        """
+        key = self.key(src, params)
+        if key is None:
+            raise FileNotFoundError(f"Input không tồn tại: {src}")
+        path = self.path_for(key)
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:  # 2 thread cùng 1 clip thì chỉ encode 1 lần
+            try:
+                os.utime(path)
+            except OSError:
+                encode_into(produce, src, path, params)
+            with self._lock:
+                self._pins[path] += 1
+        return path
+
+    def missing(self, sources, params: dict) -> list:
+        """[(src, path cache)] của các clip chưa có trong cache (mỗi nội dung 1 lần)."""
+        todo, seen = [], set()
+        for src in sources:
+            key = self.key(src, params)
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+            path = self.path_for(key)
+            if not os.path.exists(path):
+                todo.append((src, path))
+        return todo
+
+    def release(self, paths):
+        with self._lock:
+            for p in paths:
+                self._pins[p] -= 1
+                if self._pins[p] <= 0:
+                    del self._pins[p]
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                name = entry.name
+                if not name.endswith(".mp4") or name.endswith(".tmp.mp4"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def trim(self, max_bytes: int = None) -> int:
+        """Xóa clip cũ nhất tới khi tổng dung lượng <= max_bytes. Trả về số byte đã xóa."""
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        if total <= budget:
+            return 0
+        for _, size, path in sorted(entries):
+            if total <= budget:
+                break
+            with self._lock:
+                if path in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+            total -= size
+            freed += size
+        return freed
+
+
+def encode_into(produce, src: str, path: str, params: dict) -> str:
+    """produce(src, tmp, **params) rồi rename thành `path`: process khác không bao giờ thấy clip dở dang.
+
+    Hàm module-level để chạy được trong process con (ProcessPoolExecutor).
+    """
+    if os.path.exists(path):
+        return path
+    tmp = f"{os.path.splitext(path)[0]}.{os.getpid()}.{threading.get_ident()}.tmp.mp4"
+    try:
+        produce(src, tmp, **params)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def max_bytes_from_gb(gb) -> int:
+    try:
+        gb = float(gb)
+    except (TypeError, ValueError):
+        gb = DEFAULT_MAX_GB
+    return int(max(gb, 0) * 1024 ** 3)
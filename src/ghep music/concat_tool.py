@@ -1,5 +1,6 @@
 
 from helper import *
+from prenormalize import PreNormalizer, STATE_RUNNING, STATE_FAILED, STATE_CACHE_FULL, STATE_STOPPED
 
 class ConcatApp(tk.Tk):
     def __init__(self):
@@ -21,6 +22,11 @@ class ConcatApp(tk.Tk):
         self.limit_videos_var = tk.IntVar(value=0)
 
         self.mp3_list: list[str] = []
+        self.cache_folder = ""
+        self.cache_max_gb = DEFAULT_MAX_GB
+        self.prenorm_var = tk.BooleanVar(value=True)
+        self.engine_var = tk.StringVar(value=ENGINE_CACHED)
+        self.prenorm_status = tk.StringVar(value="-")
         self.total_mp4 = tk.StringVar(value="0")
         self.num_groups = tk.StringVar(value="0")
         self.groups_done = tk.StringVar(value="0")
@@ -28,14 +34,22 @@ class ConcatApp(tk.Tk):
         self.last_output_var = tk.StringVar(value="(chưa có)")
 
         self.groups: list[list[str]] = []
+        self._reload_gen = 0
+        self._applied_gen = 0   # lần reload mới nhất đã áp vào self.groups
         self.stop_flag = threading.Event()
         self.worker: threading.Thread | None = None
         self.log_q: queue.Queue[str] = queue.Queue()
 
+        # quét thư mục nguồn ở nền để reload_groups không phải chờ os.walk
+        self.folder_watcher = FolderWatcher()
+        self.folder_watcher.start()
+
         self._build_ui()
         self._layout()
 
         self.load_config()
+        # chuẩn hóa trước clip nguồn vào cache lúc rảnh -> lúc ghép chỉ còn concat copy + mix nhạc
+        self.prenormalizer = PreNormalizer(get_clip_cache(), NORMALIZE_PARAMS, normalize_video)
         if self.input_folder.get():
             self.reload_groups()
 
@@ -97,6 +111,14 @@ class ConcatApp(tk.Tk):
         self._add_folder_row("💾 Thư mục lưu:", self.save_folder, 2)
         self._add_folder_row("🎵 Thư mục nhạc:", self.bgm_folder, 3, bgm=True)
 
+        # cached: normalize từng clip (có cache) -> concat copy -> mix nhạc
+        # single-pass: 1 lệnh ffmpeg filter_complex, không file tạm
+        ttk.Label(self.frm_top, text="Engine:").grid(row=4, column=0, sticky="e", padx=4, pady=3)
+        self.combo_engine = ttk.Combobox(self.frm_top, textvariable=self.engine_var,
+                                         values=[ENGINE_CACHED, ENGINE_SINGLE_PASS], width=12, state="readonly")
+        self.combo_engine.grid(row=4, column=1, sticky="w", padx=4)
+        self.combo_engine.bind("<<ComboboxSelected>>", self._on_engine_change)
+
         # ===== các nút thao tác =====
         self.frm_buttons = ttk.Frame(self.frm_top)
         self.btn_concat = ttk.Button(self.frm_buttons, text="▶ Bắt đầu ghép", command=self.start_concat)
@@ -132,6 +154,10 @@ class ConcatApp(tk.Tk):
         ttk.Label(stats_frame, text="Đã ghép:").grid(row=0, column=4, sticky="e", padx=6)
         ttk.Label(stats_frame, textvariable=self.groups_done).grid(row=0, column=5, sticky="w")
 
+        ttk.Checkbutton(stats_frame, text="Chuẩn hóa trước:", variable=self.prenorm_var,
+                        command=self._on_prenorm_toggle).grid(row=0, column=6, sticky="e", padx=(18, 6))
+        ttk.Label(stats_frame, textvariable=self.prenorm_status).grid(row=0, column=7, sticky="w")
+
         # --- Khung log ---
         log_frame = ttk.Frame(self.frm_logstats)
         log_frame.pack(fill="both", expand=True)
@@ -211,6 +237,13 @@ class ConcatApp(tk.Tk):
                 self.bgm_folder.set(cfg.get("bgm_folder", ""))
                 self.group_size_var.set(cfg.get("group_size", 2))
                 self.bgm_volume_var.set(cfg.get("bgm_volume", 0.5))
+                # cache clip normalize: chỉ chỉnh trong config.json
+                self.cache_folder = cfg.get("cache_folder", "")
+                self.cache_max_gb = cfg.get("cache_max_gb", DEFAULT_MAX_GB)
+                self.prenorm_var.set(cfg.get("prenormalize", True))
+                if cfg.get("engine") in (ENGINE_CACHED, ENGINE_SINGLE_PASS):
+                    self.engine_var.set(cfg["engine"])
+                get_clip_cache(cfg)
                 if self.bgm_folder.get():
                     self.mp3_list = list_all_mp3_files(self.bgm_folder.get())
             except Exception as e:
@@ -223,6 +256,10 @@ class ConcatApp(tk.Tk):
             "bgm_folder": self.bgm_folder.get(),
             "group_size": self.group_size_var.get(),
             "bgm_volume": self.bgm_volume_var.get(),
+            "cache_folder": self.cache_folder,
+            "cache_max_gb": self.cache_max_gb,
+            "prenormalize": self.prenorm_var.get(),
+            "engine": self.engine_var.get(),
         }
         try:
             with open(CONFIG_FILE, "w", encoding="utf-8") as f:
@@ -234,14 +271,34 @@ class ConcatApp(tk.Tk):
         folder = self.input_folder.get()
         if not folder or not os.path.isdir(folder):
             return
-        try:
-            all_videos = list_all_mp4_files(folder)
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Đọc video lỗi: {e}")
-            return
+        self.folder_watcher.set_folders([folder], recursive=True)
+        gsize = self.group_size_var.get() or 6
+        limit_groups = self.limit_videos_var.get()
+        self.save_config()
+
+        # quét + hash fingerprint ở thread nền (lần đầu / NAS có file mới có thể rất lâu),
+        # kết quả áp vào UI bằng after(); lần reload mới hơn thì bỏ kết quả cũ
+        self._reload_gen += 1
+        gen = self._reload_gen
+        self.num_groups.set("...")
+
+        def worker():
+            try:
+                all_videos, all_groups = self._scan_groups(folder, gsize)
+            except Exception as e:
+                self.after(0, lambda err=e: self._on_reload_error(gen, err))
+                return
+            self.after(0, lambda: self._apply_groups(gen, all_videos, all_groups, limit_groups))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _scan_groups(self, folder, gsize):
+        """Chạy ở thread nền: video chưa dùng, bỏ trùng nội dung, chia nhóm ngẫu nhiên."""
+        all_videos = list_all_mp4_files(folder)
 
         # loại bỏ video đã dùng trong log
         used_videos = set()
+        used_fps = set()
         log_dir = os.path.abspath("log")
         os.makedirs(log_dir, exist_ok=True)
         log_path = os.path.join(log_dir, "log.txt")
@@ -257,19 +314,35 @@ class ConcatApp(tk.Tk):
                             data = json.loads(line)
                             for p in data.get("inputs", []):
                                 used_videos.add(os.path.abspath(p))
+                            used_fps.update(fp for fp in data.get("input_fps") or [] if fp)
                         except json.JSONDecodeError:
                             continue
             except Exception as e:
-                messagebox.showwarning("Log", f"Lỗi đọc log: {e}")
+                self.after(0, lambda err=e: messagebox.showwarning("Log", f"Lỗi đọc log: {err}"))
 
         # bỏ video đã dùng
         all_videos = [v for v in all_videos if os.path.abspath(v) not in used_videos]
 
-        gsize = self.group_size_var.get() or 6
-        all_groups = get_all_random_video_groups(all_videos, group_size=gsize)
-
+        # bỏ clip trùng nội dung (copy ở nhiều thư mục / đã ghép qua đường dẫn khác)
+        fps = FINGERPRINT_CACHE.get_many(all_videos)
+        seen_fps = set(used_fps)
+        unique_videos = []
+        for v in all_videos:
+            fp = fps.get(v)
+            if fp:
+                if fp in seen_fps:
+                    continue
+                seen_fps.add(fp)
+            unique_videos.append(v)
+        all_videos = unique_videos
+
+        return all_videos, get_all_random_video_groups(list(all_videos), group_size=gsize)
+
+    def _apply_groups(self, gen, all_videos, all_groups, limit_groups):
+        if gen != self._reload_gen:
+            return
+        self._applied_gen = gen
         # Giới hạn số lượng nhóm cần ghép
-        limit_groups = self.limit_videos_var.get()
         if limit_groups > 0:
             self.groups = all_groups[:limit_groups]
         else:
@@ -277,7 +350,65 @@ class ConcatApp(tk.Tk):
 
         self.total_mp4.set(str(len(all_videos)))
         self.num_groups.set(str(len(self.groups)))
-        self.save_config()
+        self._start_prenormalize(all_videos)
+
+    def _on_reload_error(self, gen, err):
+        if gen != self._reload_gen:
+            return
+        self._applied_gen = gen
+        self.groups = []
+        self.num_groups.set("0")
+        messagebox.showerror("Lỗi", f"Đọc video lỗi: {err}")
+
+    def _start_prenormalize(self, videos):
+        if not self.prenorm_var.get() or self.engine_var.get() != ENGINE_CACHED:
+            return
+        if self.worker and self.worker.is_alive():
+            return
+        # clip của các nhóm sắp ghép trước, phần còn lại của thư mục nguồn sau
+        grouped = [v for g in self.groups for v in g]
+        in_groups = set(grouped)
+        videos = grouped + [v for v in videos if v not in in_groups]
+
+        # kết quả cuối của lần chạy cũ (vừa bị stop) không được đè trạng thái lần chạy mới
+        run_id = self._prenorm_run = getattr(self, "_prenorm_run", 0) + 1
+
+        def on_progress(done, total, state, failed):
+            errors = f", lỗi {failed}" if failed else ""
+            if state == STATE_RUNNING:
+                text = f"{done}/{total}{errors}"
+            elif state == STATE_FAILED:
+                text = f"xong, lỗi {failed}/{total} - xem log"
+            elif state == STATE_CACHE_FULL:
+                text = f"cache đầy ({done}/{total}{errors}) - tăng cache_max_gb"
+            elif state == STATE_STOPPED:
+                text = f"tạm dừng ({done}/{total}{errors})"
+            else:
+                text = "xong"
+            self.after(0, lambda: run_id == self._prenorm_run and self.prenorm_status.set(text))
+
+        def on_error(src, err):
+            self.after(0, lambda: self._append_log(f"Chuẩn hóa trước lỗi: {src}: {err}"))
+
+        self.prenormalizer.cache = get_clip_cache()
+        self.prenormalizer.start(videos, on_progress, on_error)
+
+    def _on_engine_change(self, event=None):
+        if self.engine_var.get() == ENGINE_CACHED:
+            self.reload_groups()
+        else:
+            # single-pass không dùng cache clip -> không cần chuẩn hóa trước
+            self.prenormalizer.stop()
+            self.prenorm_status.set("-")
+            self.save_config()
+
+    def _on_prenorm_toggle(self):
+        if self.prenorm_var.get():
+            self.reload_groups()
+        else:
+            self.prenormalizer.stop()
+            self.prenorm_status.set("-")
+            self.save_config()
 
 
     
@@ -298,6 +429,8 @@ class ConcatApp(tk.Tk):
     def start_concat(self):
         if self.worker and self.worker.is_alive():
             return messagebox.showinfo("Đang chạy", "Tiến trình đang chạy.")
+        if self._applied_gen != self._reload_gen:
+            return messagebox.showinfo("Đang quét", "Đang quét thư mục nguồn, hãy thử lại sau giây lát.")
         if not self.groups:
             return messagebox.showwarning("Đã chạy hết toàn bộ", "Hãy xóa log để gen lại.")
         out_dir = self.save_folder.get()
@@ -312,6 +445,8 @@ class ConcatApp(tk.Tk):
         if limit_groups > 0:
             todo_groups = self.groups[:limit_groups]
 
+        # nhường CPU/GPU cho lần ghép; clip đang encode dở vẫn vào cache
+        self.prenormalizer.stop()
         self.stop_flag.clear()
         self.btn_concat.config(state=tk.DISABLED)
         self.btn_stop.config(state=tk.NORMAL)
@@ -332,48 +467,89 @@ class ConcatApp(tk.Tk):
         log_dir = os.path.abspath("log")
         os.makedirs(log_dir, exist_ok=True)
         log_path = os.path.join(log_dir, "log.txt")
+        engine = self.engine_var.get()
+        bgm_volume = self.bgm_volume_var.get()
+        cache = get_clip_cache()
+        # tag riêng từng nhóm: các nhóm chạy chồng lấp không dùng chung temp/log ffmpeg
+        tags = {id(group): f"_{os.getpid()}_{i}" for i, group in enumerate(todo)}
+        bgms = {}
+
+        def split(group):
+            bg_audio = random.choice(self.mp3_list) if self.mp3_list else None
+            if bg_audio and not os.path.isfile(bg_audio):
+                bg_audio = None
+            bgms[id(group)] = bg_audio
+            if engine == ENGINE_SINGLE_PASS:
+                return [lambda: render_single_pass(group, bg_audio, out_dir, bgm_volume)]
+            return [lambda p=p: normalize_cached(p, cache) for p in group]
+
+        def finish(group, results):
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if engine == ENGINE_SINGLE_PASS:
+                if errors:
+                    raise errors[0]
+                return results[0]
+
+            clips = [r for r in results if not isinstance(r, BaseException)]
+            tag = tags[id(group)]
+            temp = f"temp{tag}.mp4"
+            try:
+                if errors:
+                    raise errors[0]
+                concat_video(clips, temp, tag)
+                bg_audio = bgms[id(group)]
+                if bg_audio:
+                    output = mix_audio_with_bgm_ffmpeg(temp, bg_audio, out_dir, bgm_volume, tag)
+                else:
+                    partial = partial_output_path(out_dir)
+                    try:
+                        shutil.copy2(temp, partial)
+                        output = publish_output(partial, out_dir)
+                    finally:
+                        remove_partial(partial)
+                # thành công thì bỏ log ffmpeg riêng của nhóm, lỗi thì giữ lại để xem
+                for name in (f"ffmpeg_log{tag}.txt", f"insert_mp3{tag}.txt"):
+                    path = os.path.join(log_dir, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+                return output
+            finally:
+                cache.release(clips)
+                cache.trim()
+                if os.path.exists(temp):
+                    os.remove(temp)
+
+        def discard(group, results):
+            # bấm Dừng: nhóm đã normalize xong nhưng chưa ghép -> chỉ bỏ pin, clip vẫn ở cache
+            if engine != ENGINE_SINGLE_PASS:
+                cache.release([r for r in results if not isinstance(r, BaseException)])
 
         with open(log_path, "a", encoding="utf-8") as f_log:
-            for group in todo:
-                if self.stop_flag.is_set():
-                    break
-
-                temp = "temp.mp4"
-                try:
-                    auto_concat(group, temp)
-                    bg_audio = random.choice(self.mp3_list) if self.mp3_list else None
-                    if bg_audio and os.path.isfile(bg_audio):
-                        output = mix_audio_with_bgm_ffmpeg(temp, bg_audio, out_dir, self.bgm_volume_var.get())
-                    else:
-                        output = get_next_output_filename(out_dir)
-                        shutil.copy2(temp, output)
-                        bg_audio = None
-
+            def on_result(group, output, error):
+                if error is None:
                     # ghi log JSON
+                    bg_audio = bgms.get(id(group))
+                    fps = FINGERPRINT_CACHE.get_many(group)
                     log_entry = {
                         "output": os.path.abspath(output),
                         "inputs": [os.path.abspath(p) for p in group],
+                        "input_fps": [fps.get(p) for p in group],
                         "bgm": os.path.abspath(bg_audio) if bg_audio else None
                     }
-                    f_log.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
                     self.after(0, lambda path=output: self.last_output_var.set(path))
                     self.after(0, lambda path=output: self._append_log(f"Đã ghép xong: {path}"))
-
-
-                except Exception as e:
+                else:
                     log_entry = {
-                        "error": str(e),
+                        "error": str(error),
                         "inputs": [os.path.abspath(p) for p in group]
                     }
-                    f_log.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-
-                finally:
-                    if os.path.exists(temp):
-                        os.remove(temp)
-
+                f_log.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
                 f_log.flush()
                 self._enqueue(self._update_progress)
 
+            # nhóm k+1 normalize trong lúc nhóm k concat + mix nhạc, pool encode theo số CPU
+            GroupPipeline().run(todo, split, finish, on_result, self.stop_flag, discard)
+
 
     def _update_progress(self):
         self.progress['value'] += 1
@@ -2,7 +2,6 @@ from datetime import datetime
 import os
 import re
 import subprocess
-from concurrent.futures import ThreadPoolExecutor
 import shutil
 import pathlib
 import json
@@ -12,19 +11,64 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import shutil
 import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # src/
+from random_vids import get_folder_index
+from folder_watcher import FolderWatcher
+from fingerprint import FingerprintCache
+from clip_cache import ClipCache, max_bytes_from_gb, DEFAULT_MAX_GB
+from pipeline import GroupPipeline
 CONFIG_FILE = "ghep music/config.json"
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# dùng chung cache fingerprint với app chính
+FINGERPRINT_CACHE = FingerprintCache(os.path.join(ROOT_DIR, "fingerprints.db"))
+DEFAULT_CACHE_FOLDER = os.path.join(ROOT_DIR, "clip_cache")
+
+# tham số normalize_video dùng cho ghép; đổi ở đây thì cache tự tách theo bộ tham số mới
+NORMALIZE_PARAMS = {
+    "width": 1080,
+    "height": 1920,
+    "fps": 60,
+    "use_nvenc": True,
+    "cq": 23,
+    "v_bitrate": "12M",
+    "a_bitrate": "160k",
+    "nvenc_preset": "p4",
+}
+
+ENGINE_CACHED = "cached"            # normalize từng clip (cache) -> concat copy -> mix nhạc
+ENGINE_SINGLE_PASS = "single-pass"  # render_single_pass: 1 filter_complex, 1 lần encode
+
+_clip_cache = None
+
+
+def get_clip_cache(cfg: dict = None) -> ClipCache:
+    """Cache clip normalize; thư mục và ngân sách lấy từ config (cache_folder, cache_max_gb)."""
+    global _clip_cache
+    if cfg is None and _clip_cache is not None:
+        return _clip_cache
+    if cfg is None:
+        cfg = {}
+        if os.path.exists(CONFIG_FILE):
+            try:
+                with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                    cfg = json.load(f)
+            except Exception:
+                cfg = {}
+    folder = cfg.get("cache_folder") or DEFAULT_CACHE_FOLDER
+    max_bytes = max_bytes_from_gb(cfg.get("cache_max_gb", DEFAULT_MAX_GB))
+    if _clip_cache is None or _clip_cache.cache_dir != os.path.abspath(folder):
+        _clip_cache = ClipCache(folder, max_bytes, FINGERPRINT_CACHE.get)
+    else:
+        _clip_cache.max_bytes = max_bytes
+    return _clip_cache
 
 def list_all_mp4_files(folder_path):
     if not os.path.isdir(folder_path):
         raise ValueError(f"Không tìm thấy thư mục: {folder_path}")
-    
-    mp4_files = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith(".mp4"):
-                full_path = os.path.join(root, file)
-                mp4_files.append(full_path)
-    return mp4_files
+
+    # index đệ quy có cache theo mtime từng thư mục (được FolderWatcher giữ ấm)
+    return list(get_folder_index(folder_path, recursive=True).files)
 
 def list_all_mp3_files(folder_path):
     if not os.path.isdir(folder_path):
@@ -52,10 +96,13 @@ def get_all_random_video_groups(videos, group_size=6):
 
 
 
+_OUTPUT_NAME_LOCK = threading.Lock()
+
+
 def get_next_output_filename(folder: str) -> str:
-    max_index = 0
     pattern = re.compile(r"(\d+)\.mp4$", re.IGNORECASE)
 
+    max_index = 0
     for filename in os.listdir(folder):
         match = pattern.match(filename)
         if match:
@@ -63,8 +110,28 @@ def get_next_output_filename(folder: str) -> str:
             if index > max_index:
                 max_index = index
 
-    next_index = max_index + 1
-    return os.path.join(folder, f"{next_index}.mp4")
+    return os.path.join(folder, f"{max_index + 1}.mp4")
+
+
+def partial_output_path(folder: str) -> str:
+    """File tạm để ghi output; đuôi .part nên không bị quét/upload như video thật."""
+    return os.path.join(folder, f".partial_{os.getpid()}_{threading.get_ident()}.mp4.part")
+
+
+def publish_output(partial: str, folder: str) -> str:
+    """Đổi tên file tạm đã ghi xong thành <n>.mp4 kế tiếp (khóa để các nhóm song song không trùng tên)."""
+    with _OUTPUT_NAME_LOCK:
+        path = get_next_output_filename(folder)
+        while os.path.exists(path):
+            index = int(os.path.splitext(os.path.basename(path))[0]) + 1
+            path = os.path.join(folder, f"{index}.mp4")
+        os.replace(partial, path)
+    return path
+
+
+def remove_partial(partial: str):
+    if os.path.exists(partial):
+        os.remove(partial)
 
 
 #musc helper functions
@@ -85,21 +152,42 @@ def get_audio_duration(bgm_audio: str) -> float:
         return 0.0
 
 
+def pick_bgm_start(bgm_audio: str) -> float:
+    bgm_duration = get_audio_duration(bgm_audio)
+    if bgm_duration > 10:  # chỉ random nếu nhạc dài hơn 10s
+        return random.uniform(0, bgm_duration - 10)
+    return 0
+
+
+def has_audio_stream(path: str) -> bool:
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "a",
+                "-show_entries", "stream=index",
+                "-of", "csv=p=0",
+                path
+            ],
+            capture_output=True,
+            text=True
+        )
+        return bool(result.stdout.strip())
+    except Exception:
+        return False
+
+
 def mix_audio_with_bgm_ffmpeg(
     input_video: str,
     bgm_audio: str,
     output_dir: str,
     bgm_volume: float = 0.5,
+    tag: str = "",
 ):
-    output_video = get_next_output_filename(output_dir)
-    temp_output = "temp.mp4"
+    partial = partial_output_path(output_dir)
 
     # === lấy độ dài nhạc và chọn điểm bắt đầu random ===
-    bgm_duration = get_audio_duration(bgm_audio)
-    if bgm_duration > 10:  # chỉ random nếu nhạc dài hơn 10s
-        start_delay = random.uniform(0, bgm_duration - 10)
-    else:
-        start_delay = 0
+    start_delay = pick_bgm_start(bgm_audio)
 
     # === lệnh ffmpeg với đoạn random ===
     cmd = [
@@ -115,18 +203,20 @@ def mix_audio_with_bgm_ffmpeg(
         "-c:v", "copy",
         "-c:a", "aac",
         "-shortest",
-        output_video
+        "-f", "mp4",
+        partial
     ]
 
     os.makedirs("log", exist_ok=True)
-    with open("log/insert_mp3.txt", "w", encoding="utf-8") as log_file:
+    with open(f"log/insert_mp3{tag}.txt", "w", encoding="utf-8") as log_file:
         try:
             subprocess.run(cmd, check=True, stdout=log_file, stderr=log_file)
+            output_video = publish_output(partial, output_dir)
         except subprocess.CalledProcessError as e:
-            if os.path.exists(temp_output):
-                os.remove(temp_output)
             print(f"FFmpeg error: {e}")
             raise
+        finally:
+            remove_partial(partial)
 
     print(f"Added random BGM from {start_delay:.1f}s → {output_video}")
     return output_video
@@ -179,6 +269,29 @@ def read_log_info(log_path: str):
 
 
 
+def _h264_args(use_nv, cq, v_bitrate, nvenc_preset):
+    if use_nv:
+        return [
+            "-c:v", "h264_nvenc",
+            "-profile:v", "main",
+            "-rc", "vbr",
+            "-cq", str(int(cq)),
+            "-b:v", v_bitrate,
+            "-maxrate", v_bitrate,
+            "-bufsize", "24M",
+            "-preset", nvenc_preset,     # p1..p7 nếu hỗ trợ, else 'medium'
+        ]
+    return [
+        "-c:v", "libx264",
+        "-preset", "medium",
+        "-profile:v", "main",
+        "-level", "4.2",
+        "-crf", str(int(cq) if isinstance(cq, int) else 20),
+        "-maxrate", v_bitrate,
+        "-bufsize", "16M",
+    ]
+
+
 def normalize_video(
     input_path,
     output_path,
@@ -209,78 +322,35 @@ def normalize_video(
 
     vf = f"fps={fps},scale={width}:{height}:flags=lanczos"
 
-    if use_nv:
-        video_args = [
-            "-c:v", "h264_nvenc",
-            "-profile:v", "main",
-            "-rc", "vbr",
-            "-cq", str(int(cq)),
-            "-b:v", v_bitrate,
-            "-maxrate", v_bitrate,
-            "-bufsize", "24M",
-            "-preset", nvenc_preset,     # p1..p7 nếu hỗ trợ, else 'medium'
-        ]
-    else:
-        video_args = [
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-profile:v", "main",
-            "-level", "4.2",
-            "-crf", str(int(cq) if isinstance(cq, int) else 20),
-            "-maxrate", v_bitrate,
-            "-bufsize", "16M",
+    def build(use_nv):
+        return [
+            "ffmpeg", "-y",
+            "-fflags", "+genpts",
+            "-i", str(in_p),
+            "-vf", vf,
+            *_h264_args(use_nv, cq, v_bitrate, nvenc_preset),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            "-c:a", "aac",
+            "-ar", "48000",
+            "-b:a", a_bitrate,
+            str(out_p)
         ]
 
-    cmd = [
-        "ffmpeg", "-y",
-        "-fflags", "+genpts",
-        "-i", str(in_p),
-        "-vf", vf,
-        *video_args,
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        "-c:a", "aac",
-        "-ar", "48000",
-        "-b:a", a_bitrate,
-        str(out_p)
-    ]
-
     try:
-        run_ffmpeg(cmd)
+        run_ffmpeg(build(use_nv))
     except subprocess.CalledProcessError:
         
         if use_nv:
             print("⚠ NVENC failed → fallback libx264")
-            video_args = [
-                "-c:v", "libx264",
-                "-preset", "medium",
-                "-profile:v", "main",
-                "-level", "4.2",
-                "-crf", str(int(cq) if isinstance(cq, int) else 20),
-                "-maxrate", v_bitrate,
-                "-bufsize", "16M",
-            ]
-            cmd2 = [
-                "ffmpeg", "-y",
-                "-fflags", "+genpts",
-                "-i", str(in_p),
-                "-vf", vf,
-                *video_args,
-                "-pix_fmt", "yuv420p",
-                "-movflags", "+faststart",
-                "-c:a", "aac",
-                "-ar", "48000",
-                "-b:a", a_bitrate,
-                str(out_p)
-            ]
-            run_ffmpeg(cmd2)
+            run_ffmpeg(build(False))
         else:
             raise
 
 
 
-def concat_video(video_paths, output_path):
-    list_file = "temp.txt"
+def concat_video(video_paths, output_path, tag: str = ""):
+    list_file = f"temp{tag}.txt"
     with open(list_file, 'w', encoding='utf-8') as f:
         for path in video_paths:
             abs_path = os.path.abspath(path).replace("\\", "/")
@@ -293,33 +363,106 @@ def concat_video(video_paths, output_path):
         "-c", "copy",
         output_path
     ]
-    with open("log/ffmpeg_log.txt", "w", encoding="utf-8") as log_file:
-        subprocess.run(
-            command,
-            check=True,
-            stdout=log_file,
-            stderr=log_file
-        )
-    os.remove(list_file)
-
+    os.makedirs("log", exist_ok=True)
+    try:
+        with open(f"log/ffmpeg_log{tag}.txt", "w", encoding="utf-8") as log_file:
+            subprocess.run(
+                command,
+                check=True,
+                stdout=log_file,
+                stderr=log_file
+            )
+    finally:
+        os.remove(list_file)
+
+
+def render_single_pass(
+    input_videos,
+    bgm_audio,
+    output_dir: str,
+    bgm_volume: float = 0.5,
+    width=1080,
+    height=1920,
+    fps=60,
+    use_nvenc=True,
+    cq=23,
+    v_bitrate="12M",
+    a_bitrate="160k",
+    nvenc_preset="p4",
+):
+    """Normalize + concat + mix BGM trong 1 lần chạy ffmpeg (1 filter_complex, không file tạm).
 
-def auto_concat(input_videos, output_path):
-    normalized_paths = []
+    Thay cho concat_video + mix_audio_with_bgm_ffmpeg; trả về path video đầu ra.
+    """
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("ffmpeg không có trong PATH")
+    for p in input_videos:
+        if not os.path.exists(p):
+            raise FileNotFoundError(f"Input không tồn tại: {p}")
+
+    n = len(input_videos)
+    inputs, parts = [], []
+    for i, path in enumerate(input_videos):
+        inputs += ["-fflags", "+genpts", "-i", str(pathlib.Path(path))]
+        parts.append(f"[{i}:v]fps={fps},scale={width}:{height}:flags=lanczos,setsar=1,format=yuv420p[v{i}]")
+        if has_audio_stream(path):
+            parts.append(f"[{i}:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a{i}]")
+        else:
+            # clip không có tiếng: chèn khoảng lặng cùng độ dài để concat không lệch
+            duration = get_audio_duration(path)
+            if duration <= 0:
+                raise RuntimeError(f"Không đọc được độ dài clip (ffprobe): {path}")
+            parts.append(f"anullsrc=r=48000:cl=stereo,atrim=duration={duration}[a{i}]")
+    parts.append("".join(f"[v{i}][a{i}]" for i in range(n)) + f"concat=n={n}:v=1:a=1[vout][acat]")
+
+    audio_out = "[acat]"
+    if bgm_audio:
+        start_delay = pick_bgm_start(bgm_audio)
+        inputs += ["-ss", str(start_delay), "-i", bgm_audio]
+        parts.append(f"[{n}:a]volume={bgm_volume}[a_bgm]")
+        parts.append("[acat][a_bgm]amix=inputs=2:duration=first:dropout_transition=3[aout]")
+        audio_out = "[aout]"
+
+    partial = partial_output_path(output_dir)
+
+    def build(use_nv):
+        return [
+            "ffmpeg", "-y",
+            *inputs,
+            "-filter_complex", ";".join(parts),
+            "-map", "[vout]",
+            "-map", audio_out,
+            *_h264_args(use_nv, cq, v_bitrate, nvenc_preset),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            "-c:a", "aac",
+            "-ar", "48000",
+            "-b:a", a_bitrate,
+            "-f", "mp4",
+            partial
+        ]
 
-    def normalize_and_collect(i, path):
-        fixed = f"normalized_{i}.mp4"
-        normalize_video(path, fixed)
-        return fixed
+    use_nv = bool(use_nvenc and has_encoder("h264_nvenc"))
+    if use_nv and not nvenc_supports_preset(nvenc_preset):
+        nvenc_preset = "medium"
+    try:
+        try:
+            run_ffmpeg(build(use_nv))
+        except subprocess.CalledProcessError:
+            if not use_nv:
+                raise
+            print("⚠ NVENC failed → fallback libx264")
+            run_ffmpeg(build(False))
+        return publish_output(partial, output_dir)
+    finally:
+        remove_partial(partial)
 
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = [executor.submit(normalize_and_collect, i, path) for i, path in enumerate(input_videos)]
-        for future in futures:
-            normalized_paths.append(future.result())
 
-    concat_video(normalized_paths, output_path)
+def normalize_cached(path, cache: ClipCache = None) -> str:
+    """Clip đã normalize của `path` (lấy từ cache hoặc encode); được pin tới khi cache.release()."""
+    cache = cache or get_clip_cache()
+    return cache.get_or_create(path, NORMALIZE_PARAMS, normalize_video)
 
-    for path in normalized_paths:
-        os.remove(path)
 
 def run_ffmpeg(cmd: list):
     try:
@@ -0,0 +1,91 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+ENCODE_WORKERS = max(1, (os.cpu_count() or 2) // 2)   # mỗi ffmpeg encode đã tự chạy nhiều thread
+FINISH_WORKERS = 2                                     # concat copy + mix nhạc: nhẹ, chủ yếu I/O
+
+
+class GroupPipeline:
+    """Lập lịch ghép nhiều nhóm chồng lấp nhau thay vì làm tuần tự từng nhóm.
+
+    Mỗi nhóm gồm 2 bước:
+      - split(group) -> list job nặng (callable không tham số, vd. normalize từng clip), chạy ở
+        pool encode dùng chung cho mọi nhóm (kích thước theo số CPU);
+      - finish(group, results) -> output, chạy ở pool nhẹ khi mọi job của nhóm xong
+        (results là list kết quả hoặc Exception theo đúng thứ tự job).
+    Nhờ vậy nhóm k+1 normalize trong lúc nhóm k concat + mix nhạc.
+    """
+
+    def __init__(self, encode_workers: int = ENCODE_WORKERS, finish_workers: int = FINISH_WORKERS):
+        self.encode_workers = encode_workers
+        self.finish_workers = finish_workers
+
+    def run(self, groups, split, finish, on_result, stop_event: threading.Event = None, discard=None):
+        """Chạy hết `groups` (theo thứ tự); on_result(group, output, error) được gọi tuần tự.
+
+        Số nhóm đã nhận mà chưa xong (đang encode + đang/chờ finish) bị giới hạn, đủ để pool
+        encode luôn bận và thêm 1 nhóm ở bước finish. stop_event được set thì không nhận nhóm
+        mới và không chạy finish cho nhóm vừa encode xong: nhóm đó được trả cho
+        discard(group, results) (vd. bỏ pin clip) và không báo on_result; finish đang chạy thì
+        vẫn chạy xong.
+        """
+        if not groups:
+            return
+        result_lock = threading.Lock()
+
+        def stopped():
+            return stop_event is not None and stop_event.is_set()
+
+        def report(group, output, error):
+            with result_lock:
+                on_result(group, output, error)
+
+        def run_finish(group, results):
+            try:
+                output = finish(group, results)
+            except Exception as e:
+                report(group, None, e)
+            else:
+                report(group, output, None)
+
+        with ThreadPoolExecutor(max_workers=self.encode_workers) as encode_pool, \
+                ThreadPoolExecutor(max_workers=self.finish_workers) as finish_pool:
+            it = iter(groups)
+            max_ahead = 1       # biết số job/nhóm sau lần split đầu tiên
+            sized = False
+            encoding = []       # [(group, futures)] đang ở bước encode
+            finishing = set()   # future finish đang chạy/chờ
+
+            def admit():
+                nonlocal max_ahead, sized
+                while len(encoding) + len(finishing) < max_ahead and not stopped():
+                    group = next(it, None)
+                    if group is None:
+                        return
+                    try:
+                        jobs = split(group)
+                    except Exception as e:
+                        report(group, None, e)
+                        continue
+                    if not sized:
+                        # đủ nhóm để pool encode luôn bận, +1 nhóm đang ở bước finish
+                        max_ahead = -(-self.encode_workers // max(1, len(jobs))) + 1
+                        sized = True
+                    encoding.append((group, [encode_pool.submit(job) for job in jobs]))
+
+            admit()
+            while encoding or finishing:
+                pending = [f for _, futures in encoding for f in futures if not f.done()]
+                wait(pending + list(finishing), return_when=FIRST_COMPLETED)
+                finishing = {f for f in finishing if not f.done()}
+                for entry in [e for e in encoding if all(f.done() for f in e[1])]:
+                    encoding.remove(entry)
+                    group, futures = entry
+                    results = [f.exception() or f.result() for f in futures]
+                    if stopped():
+                        if discard is not None:
+                            discard(group, results)
+                        continue
+                    finishing.add(finish_pool.submit(run_finish, group, results))
+                admit()
@@ -0,0 +1,114 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from clip_cache import ClipCache, encode_into
+from pipeline import ENCODE_WORKERS
+
+FILL_RATIO = 0.9   # dừng khi cache đã đầy 90% ngân sách, tránh tự xóa clip vừa encode
+
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CACHE_FULL = "cache_full"
+STATE_STOPPED = "stopped"
+
+
+def _lower_priority():
+    # process con chạy ở mức ưu tiên thấp để app / lần ghép đang chạy không bị giật
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+class PreNormalizer:
+    """Job nền: normalize trước các clip nguồn vào ClipCache bằng process pool.
+
+    Khi bấm ghép thì gọi stop(): không giao thêm clip mới, các clip đang encode vẫn chạy xong
+    và được lần ghép dùng lại qua cache.
+    """
+
+    def __init__(self, cache: ClipCache, params: dict, produce, max_workers: int = ENCODE_WORKERS):
+        self.cache = cache
+        self.params = params
+        self.produce = produce
+        self.max_workers = max_workers
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, sources, on_progress=None, on_error=None):
+        """Bắt đầu (lại) với danh sách clip `sources`.
+
+        on_progress(done, total, state, failed) gọi từ thread nền; done gồm cả clip lỗi, failed là
+        số clip lỗi. state là STATE_RUNNING trong lúc chạy, cuối cùng là STATE_DONE /
+        STATE_FAILED (chạy hết nhưng có clip lỗi) / STATE_CACHE_FULL (dừng vì hết ngân sách cache)
+        / STATE_STOPPED. on_error(src, error) gọi cho từng clip lỗi.
+        """
+        self.stop()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(list(sources), on_progress, on_error, self._stopped),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _cache_full(self):
+        return self.cache.size() >= self.cache.max_bytes * FILL_RATIO
+
+    def _run(self, sources, on_progress, on_error, stopped):
+        todo = self.cache.missing(sources, self.params)
+        total = len(todo)
+        done = failed = 0
+        if not todo:
+            if on_progress:
+                on_progress(done, total, STATE_DONE, failed)
+            return
+        if on_progress:
+            on_progress(done, total, STATE_RUNNING, failed)
+
+        it = iter(todo)
+        pending = set()
+        sources_of = {}   # future -> clip nguồn, để báo lỗi
+        cache_full = False
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_lower_priority) as ex:
+            while True:
+                while len(pending) < self.max_workers and not stopped.is_set():
+                    if self._cache_full():
+                        cache_full = True
+                        break
+                    job = next(it, None)
+                    if job is None:
+                        break
+                    src, path = job
+                    fut = ex.submit(encode_into, self.produce, src, path, self.params)
+                    sources_of[fut] = src
+                    pending.add(fut)
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    done += 1
+                    src = sources_of.pop(fut)
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"Pre-normalize lỗi: {src}: {e}")
+                        if on_error:
+                            on_error(src, e)
+                if on_progress:
+                    on_progress(done, total, STATE_RUNNING, failed)
+
+        if on_progress:
+            if done >= total:
+                state = STATE_FAILED if failed else STATE_DONE
+            elif cache_full:
+                state = STATE_CACHE_FULL
+            else:
+                state = STATE_STOPPED
+            on_progress(done, total, state, failed)
@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import namedtuple
+from random_vids import get_folder_index
+
+GroupInfo = namedtuple("GroupInfo", "name csv_path channels mapped_dir videos available")
+
+
+def is_group_csv(name: str) -> bool:
+    nl = name.lower()
+    if not nl.endswith(".csv"):
+        return False
+    return not ("__assignments_" in nl or nl.startswith("assignments_"))
+
+
+class GroupCatalog:
+    """Danh sách group + metadata (số channel, thư mục map, số video còn dùng được) giữ trong RAM.
+
+    Thư mục group chỉ scandir lại khi mtime đổi; số channel chỉ đọc lại khi CSV đổi
+    (mtime, size); số video lấy từ FolderIndex và chỉ đếm lại khi index hoặc tập đã dùng đổi.
+    """
+
+    def __init__(self, groups_dir: str, channel_reader, group_dirs, used_paths):
+        self.groups_dir = groups_dir
+        self._read_channels = channel_reader   # csv_path -> list channel
+        self._group_dirs = group_dirs          # () -> {group: thư mục video}
+        self._used_paths = used_paths          # () -> set path đã dùng
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._entries = {}   # tên file csv -> [(mtime_ns, size), n_channels]
+        self._counts = {}    # thư mục video -> (files, used, len(used), available)
+
+    def _scan(self):
+        try:
+            mtime = os.stat(self.groups_dir).st_mtime_ns
+        except OSError:
+            self._dir_mtime = None
+            self._entries = {}
+            return
+        if mtime == self._dir_mtime:
+            return
+        entries = {}
+        with os.scandir(self.groups_dir) as it:
+            for entry in it:
+                if is_group_csv(entry.name) and entry.is_file():
+                    entries[entry.name] = self._entries.get(entry.name) or [None, 0]
+        self._dir_mtime = mtime
+        self._entries = entries
+
+    def names(self) -> list:
+        """Tên các file CSV group (đã sort), như list_group_csvs."""
+        with self._lock:
+            self._scan()
+            return sorted(self._entries)
+
+    def _channel_count(self, name):
+        entry = self._entries[name]
+        path = os.path.join(self.groups_dir, name)
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return 0
+        if entry[0] != stamp:
+            entry[1] = len(self._read_channels(path))
+            entry[0] = stamp
+        return entry[1]
+
+    def _video_counts(self, folder, used):
+        if not folder or not os.path.isdir(folder):
+            return 0, 0
+        files = get_folder_index(folder).files
+        cached = self._counts.get(folder)
+        if cached and cached[0] is files and cached[1] is used and cached[2] == len(used):
+            return len(files), cached[3]
+        available = sum(1 for f in files if f not in used)
+        self._counts[folder] = (files, used, len(used), available)
+        return len(files), available
+
+    def all(self) -> list:
+        """GroupInfo của mọi group, theo tên."""
+        group_dirs = self._group_dirs()
+        used = self._used_paths()
+        out = []
+        with self._lock:
+            self._scan()
+            for name in sorted(self._entries):
+                key = os.path.splitext(name)[0]
+                mapped = group_dirs.get(key) or group_dirs.get(name) or ""
+                videos, available = self._video_counts(mapped, used)
+                out.append(GroupInfo(key, os.path.join(self.groups_dir, name),
+                                     self._channel_count(name), mapped, videos, available))
+        return out
@@ -5,10 +5,11 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from module import (list_group_csvs, 
     read_channels_from_csv,normalize_lines,
-    assign_pairs, load_group_dirs, 
-    load_used_videos, get_mp4_filename, 
+    load_group_dirs, get_mp4_filename, 
+    allocate_publish_slots,
     load_group_config, save_group_config,
-    CONFIG_PATH
+    reserve_videos, release_videos, load_reserved_videos,
+    get_config_service, get_group_catalog
     
     )
 from hyperparameter import (
@@ -19,10 +20,12 @@ from hyperparameter import (
 )
 from tkcalendar  import DateEntry
 from openpyxl.styles import Font
-from random_vids import get_random_unused_mp4
+from preview_engine import build_preview_rows, PreviewCancelled
 import glob
 from ui_theme import setup_theme
-from excel_helper import save_assignments_to_excel, combine_excels
+from virtual_table import VirtualTable
+from folder_watcher import FolderWatcher
+from excel_helper import save_assignments, combine_excels, shard_combined_excel, EXPORT_WRITERS
 import tkinter.simpledialog as sd
 from hyperparameter import APP_VERSION, UPDATE_MANIFEST
 from update_manager import check_and_update, install_from_zip
@@ -96,6 +99,7 @@ class App(tk.Tk):
         # Cache & state
         self._channels_cache = []
         self._last_assignments = None  # list[(channel, title, desc, publish_date, publish_time)]
+        self._preview_gen = 0
 
         # Date/Time header controls state
         self.date_entry = None  
@@ -103,6 +107,16 @@ class App(tk.Tk):
         self.time_h_var = tk.StringVar(value=f"{now.hour:02d}")
         self.time_m_var = tk.StringVar(value=f"{now.minute:02d}")
         self.step_min_var = tk.IntVar(value=30) 
+        self.quota_cap_var = tk.IntVar(value=3)
+        self.quota_gap_var = tk.IntVar(value=120)
+
+        # giữ index video của các folder đã map luôn sẵn trong RAM
+        self._folder_watcher = FolderWatcher()
+        self._folder_watcher.start()
+        # lỗi ghi config ở thread nền (file bị khóa, thiếu quyền...) vẫn phải báo lên UI
+        get_config_service().on_error = lambda e: self.after(
+            0, lambda: messagebox.showerror("Error", f"Error when write config:\n{e}"))
+        self._watch_group_folders()
 
         self._build_header()
         self._build_inputs()
@@ -137,6 +151,7 @@ class App(tk.Tk):
 
         self.channel_count_lbl = ttk.Label(frm, text="0 channels")
         self.channel_count_lbl.grid(row=0, column=4, sticky="w", padx=(12, 0))
+        ttk.Button(frm, text="Groups Overview", command=self._open_groups_overview).grid(row=0, column=5, sticky="w", padx=(12, 0))
         frm.columnconfigure(1, weight=1)
 
         # Distribution mode
@@ -145,6 +160,14 @@ class App(tk.Tk):
         ttk.Label(frm2, text="Distribution mode:").pack(side=tk.LEFT)
         ttk.Radiobutton(frm2, text="Repeat", variable=self.mode_var, value="titles").pack(side=tk.LEFT, padx=(8, 0))
         ttk.Radiobutton(frm2, text="No Repeat", variable=self.mode_var, value="channels").pack(side=tk.LEFT, padx=(8, 0))
+        ttk.Radiobutton(frm2, text="Quota", variable=self.mode_var, value="quota").pack(side=tk.LEFT, padx=(8, 0))
+
+        # Quota mode: giới hạn mỗi channel/ngày + khoảng cách tối thiểu giữa 2 video
+        ttk.Label(frm2, text="Daily cap:").pack(side=tk.LEFT, padx=(16, 0))
+        tk.Spinbox(frm2, from_=1, to=100, width=4, textvariable=self.quota_cap_var).pack(side=tk.LEFT, padx=(6, 0))
+        ttk.Label(frm2, text="Min gap (min):").pack(side=tk.LEFT, padx=(12, 0))
+        tk.Spinbox(frm2, from_=0, to=1440, increment=15, width=5,
+                   textvariable=self.quota_gap_var).pack(side=tk.LEFT, padx=(6, 0))
 
         # Date/Time controls (apply to ALL rows)
         frm3 = ttk.Frame(self, padding=(10, 6, 10, 0))
@@ -218,8 +241,10 @@ class App(tk.Tk):
         frm.pack(fill=tk.BOTH, expand=True)
 
         cols = ("channel", "directory", "title", "description", "publish_date", "publish_time")
-        self.tree = ttk.Treeview(frm, columns=cols, show="headings", height=12)
-        
+        # bảng ảo: chỉ các dòng đang hiển thị mới là item Tk, dữ liệu nằm ở _last_assignments
+        self.table = VirtualTable(frm, columns=cols)
+        self.tree = self.table.tree
+
         for col in cols:
             self.tree.heading(col, text=col.capitalize())
             if col == "description":
@@ -235,11 +260,7 @@ class App(tk.Tk):
             elif col == "directory":
                 self.tree.column(col, width=240, anchor="w")
 
-        vsb = ttk.Scrollbar(frm, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=vsb.set)
-
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        vsb.pack(side=tk.LEFT, fill=tk.Y)
+        self.table.pack(fill=tk.BOTH, expand=True)
 
         # Double-click edit row
         self.tree.bind("<Double-1>", self._on_tree_double_click)
@@ -250,7 +271,11 @@ class App(tk.Tk):
 
         btns = ttk.Frame(self, padding=(10, 0, 10, 10))
         btns.pack(fill=tk.X)
-        ttk.Button(btns, text="Save Excel", command=self._save_excel).pack(side=tk.LEFT)
+        ttk.Button(btns, text="Save", command=self._save_excel).pack(side=tk.LEFT)
+        ttk.Label(btns, text="Format:").pack(side=tk.LEFT, padx=(12, 4))
+        self.export_fmt_var = tk.StringVar(value="xlsx")
+        ttk.Combobox(btns, textvariable=self.export_fmt_var, values=list(EXPORT_WRITERS),
+                     state="readonly", width=8).pack(side=tk.LEFT)
 
     def _build_footer(self):
         bar = ttk.Frame(self, relief=tk.SUNKEN, padding=6)
@@ -268,11 +293,22 @@ class App(tk.Tk):
                 self.move_folder_var.set(folder)
                 group_name = self.group_file_var.get().strip()
                 if group_name:
-                    save_group_config(group_name, folder)
+                    try:
+                        save_group_config(group_name, folder)
+                        get_config_service().flush()  # thao tác của người dùng: ghi ngay để báo lỗi được
+                    except Exception as e:
+                        messagebox.showerror("Error", f"Error when write:\n{e}")
 
         ttk.Button(bar, text="Browse", command=choose_folder).pack(side=tk.LEFT, padx=(0, 8))
 
+        # Shard: tách upload_data.xlsx thành K file cho K GPM runner chạy song song
+        ttk.Button(bar, text="Shard", command=self._shard_combined).pack(side=tk.RIGHT)
+        self.shard_count_var = tk.IntVar(value=2)
+        ttk.Spinbox(bar, from_=1, to=32, width=4, textvariable=self.shard_count_var).pack(side=tk.RIGHT, padx=(8, 4))
         ttk.Button(bar, text="Combine", command=self._combine_excels).pack(side=tk.RIGHT)
+        # Incremental: chỉ nối dòng mới vào upload_data.xlsx, không xóa file group
+        self.incremental_combine_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bar, text="Incremental", variable=self.incremental_combine_var).pack(side=tk.RIGHT, padx=(0, 8))
         ttk.Label(bar, textvariable=self.status_var).pack(side=tk.LEFT)
 
 
@@ -311,6 +347,9 @@ class App(tk.Tk):
         group_dirs = load_group_dirs()
         mapped_dir = group_dirs.get(name) or group_dirs.get(f"{name}.csv") or ""
 
+        if mapped_dir:
+            self._folder_watcher.touch(mapped_dir)
+
         # Status map
         mapped_note = f" | mapped: {mapped_dir}" if mapped_dir else " | mapped: (none)"
         self._set_status(f"Loaded {len(channels)} channels from {name}{mapped_note}")
@@ -319,11 +358,75 @@ class App(tk.Tk):
         self.move_folder_var.set(last_folder)
 
 
+    def _open_groups_overview(self):
+        """Bảng tất cả group: số channel, thư mục map, số video còn dùng được."""
+        win = getattr(self, "_groups_win", None)
+        if win is not None and win.winfo_exists():
+            win.lift()
+            return
+        win = tk.Toplevel(self)
+        win.title("Groups Overview")
+        win.geometry("900x400")
+        self._groups_win = win
+
+        cols = ("group", "channels", "mapped", "videos", "available", "status")
+        tree = ttk.Treeview(win, columns=cols, show="headings")
+        widths = {"group": 160, "channels": 80, "mapped": 360, "videos": 80, "available": 80, "status": 100}
+        for col in cols:
+            tree.heading(col, text=col.capitalize())
+            tree.column(col, width=widths[col], anchor="w")
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        def status(g):
+            if not g.mapped_dir:
+                return "not mapped"
+            if g.available < g.channels:
+                return f"short {g.channels - g.available}"
+            return "ready"
+
+        def apply(rows):
+            if not win.winfo_exists():
+                return
+            if rows is not None:
+                tree.delete(*tree.get_children())
+                for row in rows:
+                    tree.insert("", tk.END, iid=row[0], values=row)
+            win.after(5000, refresh)
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+
+            # đọc log.txt / quét thư mục ở thread nền, Tk chỉ vẽ lại bảng
+            def worker():
+                try:
+                    rows = [(g.name, g.channels, g.mapped_dir or "(none)", g.videos, g.available, status(g))
+                            for g in get_group_catalog(GROUPS_DIR).all()]
+                except Exception as e:
+                    print(f"Groups overview lỗi: {e}")
+                    rows = None
+                self.after(0, lambda: apply(rows))
+
+            threading.Thread(target=worker, daemon=True).start()
+
+        def on_open(event=None):
+            name = tree.focus()
+            if name:
+                self.group_file_var.set(name)
+                self._load_channels()
+
+        tree.bind("<Double-1>", on_open)
+        refresh()
+
+    def _watch_group_folders(self):
+        self._folder_watcher.set_folders(set(load_group_dirs().values()))
+
     def _clear_inputs(self):
         self.txt_titles.delete("1.0", tk.END)
         self.txt_descs.delete("1.0", tk.END)
-        self.tree.delete(*self.tree.get_children())
+        self._preview_gen += 1
         self._last_assignments = None
+        self.table.set_rows([])
         self._set_status("Cleared inputs & preview.")
 
     def _preview(self):
@@ -335,51 +438,62 @@ class App(tk.Tk):
         titles = normalize_lines(self.txt_titles.get("1.0", tk.END))
         descs = normalize_lines(self.txt_descs.get("1.0", tk.END))
         times = normalize_lines(self.txt_times.get("1.0", tk.END))   # <== thêm dòng này
-        channels = self._channels_cache
+        channels = list(self._channels_cache)
         mode = self.mode_var.get()
+        quota = None
+        if mode == "quota":
+            start_dt = self._read_base_datetime()
+            if start_dt is None:
+                return
+            try:
+                quota = dict(start_dt=start_dt,
+                             daily_cap=int(self.quota_cap_var.get()),
+                             spacing_min=int(self.quota_gap_var.get()))
+            except (tk.TclError, ValueError):
+                messagebox.showerror("Invalid quota", "Daily cap / Min gap phải là số nguyên.")
+                return
+
+        # mỗi lần preview có 1 generation mới, worker cũ tự hủy khi thấy số đã đổi
+        self._preview_gen += 1
+        gen = self._preview_gen
 
         if not titles and not descs:
-            self.tree.delete(*self.tree.get_children())
             self._last_assignments = None
+            self.table.set_rows([])
             self._set_status("Inputs empty → preview cleared.")
             return
 
-        try:
-            assignments = assign_pairs(channels, titles, descs, mode=mode)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            return
-
-        group_dirs = load_group_dirs()
-        key = self.group_file_var.get().strip()
-        folder_path = group_dirs.get(key) or group_dirs.get(f"{key}.csv")
-
-        used_paths = load_used_videos()
-        session_used = set()
-        self.tree.delete(*self.tree.get_children())
-        extended = []
+        previous = list(self._last_assignments or [])
 
-        for i, (ch, t, d) in enumerate(assignments):
+        def is_stale():
+            return gen != self._preview_gen
 
-            pt = times[i] if i < len(times) else ""
-            #if time ->> date = today
-            pd = datetime.date.today().strftime("%m/%d/%Y") if pt else ""
+        def worker():
+            try:
+                rows = build_preview_rows(group_file, channels, titles, descs, times, mode,
+                                          is_stale, previous, quota)
+            except PreviewCancelled:
+                return
+            except Exception as e:
+                self.after(0, lambda err=e: self._on_preview_error(gen, err))
+                return
+            self.after(0, lambda: self._apply_preview(gen, rows))
 
-            if folder_path and os.path.isdir(folder_path):
-                directory = get_random_unused_mp4(folder_path, used_paths | session_used)
-                if directory:
-                    session_used.add(directory)
-            else:
-                directory = ""
+        self._set_status("Previewing...")
+        threading.Thread(target=worker, daemon=True).start()
 
-            self.tree.insert("", tk.END, values=(ch, directory, t, d, pd, pt))
-            extended.append((ch, directory, t, d, pd, pt))
+    def _apply_preview(self, gen, rows):
+        if gen != self._preview_gen:
+            return
+        self._last_assignments = rows
+        # bảng chỉ vẽ lại các dòng đang hiển thị có thay đổi
+        self.table.set_rows(rows)
+        self._set_status(f"Previewed {len(rows)} rows")
 
-        self._last_assignments = extended
-        if mode == "titles":
-            self._set_status(f"Previewed {len(assignments)} rows")
-        else:
-            self._set_status(f"Previewed {len(assignments)} rows")
+    def _on_preview_error(self, gen, err):
+        if gen != self._preview_gen:
+            return
+        messagebox.showerror("Error", str(err))
 
 
 
@@ -388,16 +502,34 @@ class App(tk.Tk):
             messagebox.showwarning("Nothing to save", "Click Preview first.")
             return
 
+        rows = list(self._last_assignments)
+        fmt = self.export_fmt_var.get() or "xlsx"
+
         def worker():
             try:
                 base = os.path.splitext(self.group_file_var.get().strip())[0] or "group"
-                out_name = f"{base}.xlsx"
+                out_name = f"{base}.{fmt}"
                 out_path = os.path.join(OUTPUT_DIR, out_name)
 
-                save_assignments_to_excel(self._last_assignments, out_path)
-                self._set_status(f"Saved Excel: {out_path}")
+                # giữ chỗ video trong ledger để planner khác không dùng trùng; lần Save trước
+                # của cùng group được thay thế (video không còn trong plan được trả lại)
+                dirs = [r[1] for r in rows]
+                previous = set(load_reserved_videos(base))
+                conflicts = reserve_videos(dirs, base)
+                if conflicts:
+                    messagebox.showwarning(
+                        "Video conflict",
+                        f"{len(conflicts)} video đã được planner khác sử dụng.\nHãy preview lại trước khi lưu."
+                    )
+                    return
+                try:
+                    save_assignments(rows, out_path, fmt)
+                except Exception:
+                    release_videos([d for d in dirs if d not in previous])
+                    raise
+                self._set_status(f"Saved {fmt}: {out_path}")
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to save Excel:\n{e}")
+                messagebox.showerror("Error", f"Failed to save {fmt}:\n{e}")
 
         threading.Thread(target=worker, daemon=True).start()
 
@@ -412,15 +544,14 @@ class App(tk.Tk):
         region = self.tree.identify("region", event.x, event.y)
         if region != "cell":
             return
-        item_id = self.tree.identify_row(event.y)
-        if not item_id:
+        index = self.table.index_at(event.y)
+        if index is None:
             return
-        index = self.tree.index(item_id)
-        self._edit_row_dialog(item_id, index)
+        self._edit_row_dialog(index)
 
 
-    def _edit_row_dialog(self, item_id, index):
-        vals = list(self.tree.item(item_id, "values"))
+    def _edit_row_dialog(self, index):
+        vals = list(self._last_assignments[index])
         vals += [""] * max(0, 6 - len(vals))
         ch_cur, dir_cur, title_cur, desc_cur, pd_cur, pt_cur = vals
 
@@ -509,10 +640,9 @@ class App(tk.Tk):
                 return
 
             new_vals = (ch, directory, t, d, pd, pt)
-            self.tree.item(item_id, values=new_vals)
-
-            if 0 <= index < len(self._last_assignments):
+            if self._last_assignments and 0 <= index < len(self._last_assignments):
                 self._last_assignments[index] = new_vals
+                self.table.refresh()
 
             self._set_status(f"Updated row {index+1}.")
             win.destroy()
@@ -541,7 +671,8 @@ class App(tk.Tk):
 
 
     # ---------- Apply date/time to ALL ----------
-    def _apply_date_time_all(self):
+    def _read_base_datetime(self):
+        """Ngày + giờ đang chọn trên header; báo lỗi và trả về None nếu không hợp lệ."""
     # --- get date ---
         if hasattr(self.date_entry, "get_date"):
             try:
@@ -553,23 +684,29 @@ class App(tk.Tk):
             date_str = str(self.date_entry.get()).strip()
 
         try:
-            datetime.datetime.strptime(date_str, "%m/%d/%Y")
+            date_val = datetime.datetime.strptime(date_str, "%m/%d/%Y")
         except ValueError:
             messagebox.showerror("Invalid date", "Định dạng ngày phải là MM/DD/YYYY.")
-            return
+            return None
 
         # --- get time ---
         hh = self.time_h_var.get().strip()
         mm = self.time_m_var.get().strip()
-        step = self.step_min_var.get()
 
         if not (hh.isdigit() and mm.isdigit()):
             messagebox.showerror("Invalid time", "Giờ/Phút phải là số.")
-            return
+            return None
         h, m = int(hh), int(mm)
         if not (0 <= h <= 23 and 0 <= m <= 59):
             messagebox.showerror("Invalid time", "Giờ phải 00-23, phút 00-59.")
+            return None
+        return date_val.replace(hour=h, minute=m)
+
+    def _apply_date_time_all(self):
+        start_dt = self._read_base_datetime()
+        if start_dt is None:
             return
+        step = self.step_min_var.get()
 
         try:
             step = int(step)
@@ -580,23 +717,13 @@ class App(tk.Tk):
             messagebox.showerror("Invalid step", "Step (min) không được âm.")
             return
 
-        base_dt = datetime.datetime(2000, 1, 1, h, m)
-        ids = self.tree.get_children()
-
-        for i, iid in enumerate(ids):
-            tm = (base_dt + datetime.timedelta(minutes=step)).time()
-            time_str = f"{tm.hour:02d}:{tm.minute:02d}"
-
-            vals = list(self.tree.item(iid, "values"))
-            vals += [""] * max(0, 6 - len(vals))
-            ch, directory, t, desc, _, _ = vals
-            new_vals = (ch, directory, t, desc, date_str, time_str)
-
-            self.tree.item(iid, values=new_vals)
-            if self._last_assignments and i < len(self._last_assignments):
-                self._last_assignments[i] = new_vals    
+        rows = self._last_assignments or []
+        # tính lịch cho toàn bộ plan 1 lần rồi cập nhật model + bảng 1 lần
+        dates, times = allocate_publish_slots([r[0] for r in rows], start_dt, step)
+        rows[:] = [(r[0], r[1], r[2], r[3], d, t) for r, d, t in zip(rows, dates, times)]
 
-        self._set_status(f"Tổng cộng có: {len(ids)} dòng.")
+        self.table.refresh()
+        self._set_status(f"Tổng cộng có: {len(rows)} dòng.")
 
     def _combine_excels(self):
         input_dir = OUTPUT_DIR
@@ -604,38 +731,59 @@ class App(tk.Tk):
         move_folder = self.move_folder_var.get().strip()
 
         try:
-            count, files = combine_excels(input_dir, output_file, move_folder, get_mp4_filename)
+            count, files, timings = combine_excels(input_dir, output_file, move_folder, get_mp4_filename,
+                                                   incremental=self.incremental_combine_var.get())
             if count == 0:
                 messagebox.showwarning("No files", f"Không tìm thấy file Excel nào trong:\n{input_dir}")
                 return
-            self._set_status(f"Combined {count} files → {output_file}")
-            messagebox.showinfo("Done", f"Combined successfully")
+            total_rows = sum(n for _, n, _ in timings)
+            self._set_status(f"Combined {count} files ({total_rows} new/updated rows) → {output_file}")
+            detail = "\n".join(
+                f"{os.path.basename(f)}: {n} rows, {sec:.2f}s" for f, n, sec in timings
+            )
+            messagebox.showinfo("Done", f"Combined successfully\n\n{detail}")
         except Exception as e:
             messagebox.showerror("Error", f"Lỗi khi combine:\n{e}")
 
+    def _shard_combined(self):
+        if not os.path.isfile(EXCEL_DIR):
+            messagebox.showwarning("No file", f"Chưa có file combine:\n{EXCEL_DIR}")
+            return
+        try:
+            k = max(1, int(self.shard_count_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Số shard không hợp lệ.")
+            return
+        try:
+            shards = shard_combined_excel(EXCEL_DIR, k)
+        except Exception as e:
+            messagebox.showerror("Error", f"Lỗi khi shard:\n{e}")
+            return
+        self._set_status(f"Sharded {EXCEL_DIR} → {len(shards)} files")
+        detail = "\n".join(f"{os.path.basename(p)}: {n} rows" for p, n in shards)
+        messagebox.showinfo("Done", f"Sharded successfully\n\n{detail}")
+
     def _delete_selected_rows(self, event=None):
-        items = self.tree.selection()
-        if not items:
+        items = set(self.table.selection_indices())
+        if not items or not self._last_assignments:
             return
         confirm = messagebox.askyesno("Confirm delete", f"Delete {len(items)} row(s)?")
         if not confirm:
             return
 
-        for item_id in items:
-            index = self.tree.index(item_id)
-            self.tree.delete(item_id)
-            if self._last_assignments and 0 <= index < len(self._last_assignments):
-                self._last_assignments.pop(index)
+        # sửa tại chỗ để bảng và _last_assignments vẫn dùng chung 1 list
+        self._last_assignments[:] = [r for i, r in enumerate(self._last_assignments) if i not in items]
+        self.table.select([])
 
         self._set_status(f"Deleted {len(items)} row(s).")
 
     def _show_tree_menu(self, event):
-        item_id = self.tree.identify_row(event.y)
-        if not item_id:
+        index = self.table.index_at(event.y)
+        if index is None:
             return
 
-        if item_id not in self.tree.selection():
-            self.tree.selection_set(item_id)
+        if index not in self.table.selected:
+            self.table.select([index])
 
         menu = tk.Menu(self, tearoff=0)
         menu.add_command(label="Delete", command=lambda: self._delete_selected_rows())
@@ -747,28 +895,16 @@ class App(tk.Tk):
 
         folder = os.path.abspath(folder)
 
-        lines = []
-        if os.path.exists(CONFIG_PATH):
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                for raw in f:
-                    line = raw.strip()
-                    if ":" not in line:
-                        continue
-                    k, _ = line.split(":", 1)
-                    k = k.strip()
-                    if k in (name, f"{name}.csv"):
-                        continue
-                    lines.append(line)
-        lines.append(f"{name}:{folder}")
-
         try:
-            with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-                f.write("\n".join(lines) + ("\n" if lines else ""))
+            get_config_service().set_group_dir(name, folder)
+            get_config_service().flush()
             self._set_status(f"Mapped '{name}' → {folder}")
         except Exception as e:
             messagebox.showerror("Error", f"Error when write:\n{e}")
             return
 
+        self._watch_group_folders()
+
         self._load_channels()
 
     def _check_for_updates(self):
@@ -787,7 +923,7 @@ class App(tk.Tk):
 
 
     def _restart_app(self):
-
+        get_config_service().flush()  # process mới phải thấy config vừa đổi
         python = sys.executable
         script = os.path.abspath(sys.argv[0])
         args = sys.argv[1:]
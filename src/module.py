@@ -1,60 +1,81 @@
 
 import itertools
-from hyperparameter import CHANNEL_HEADER_HINTS
+from array import array
+import datetime
+import heapq
+from hyperparameter import CHANNEL_HEADER_HINTS, OUTPUT_DIR
 import os
 import csv
-import json
+from used_ledger import UsedLedger
+from fingerprint import FingerprintCache
+from config_service import ConfigService, parse_group_dirs, normalize_group_dirs
+from group_catalog import GroupCatalog
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # lấy thư mục gốc
 CONFIG_FILE = os.path.join(BASE_DIR,"config.json")
 USED_LOG_FILE = os.path.join(BASE_DIR,"log.txt")
+USED_DB_FILE = os.path.join(BASE_DIR,"used_videos.db")
+FINGERPRINT_DB_FILE = os.path.join(BASE_DIR,"fingerprints.db")
 CONFIG_PATH = os.path.join(BASE_DIR,"config_dir")
 
 
 def list_group_csvs(groups_dir: str):
     if not os.path.isdir(groups_dir):
         return []
-    files = []
-    for name in os.listdir(groups_dir):
-        p = os.path.join(groups_dir, name)
-        nl = name.lower()
-        if os.path.isfile(p) and nl.endswith(".csv"):
-            if "__assignments_" in nl or nl.startswith("assignments_"):
-                continue
-            files.append(name)
-    return sorted(files)
+    return get_group_catalog(groups_dir).names()
 
 
-def read_channels_from_csv(csv_path: str):
+_CHANNELS_CACHE = {}  # path -> (mtime_ns, size, tuple(channels))
+
+
+def _channel_col(first_row):
+    """Cột channel theo header (None nếu dòng đầu không phải header)."""
+    lower_header = [(c or "").strip().lower() for c in first_row]
+    for hint in CHANNEL_HEADER_HINTS:
+        if hint in lower_header:
+            return lower_header.index(hint)
+    return None
+
+
+def _parse_channels(f):
+    reader = csv.reader(f)
+    first = next(reader, None)
+    if first is None:
+        return []
+    col_idx = _channel_col(first) if first else None
+
+    def pick(row):
+        if col_idx is not None and col_idx < len(row):
+            return (row[col_idx] or "").strip()
+        return next((c.strip() for c in row if c and c.strip()), "")
+
     channels = []
-    if not os.path.isfile(csv_path):
-        return channels
-    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
-        rows = list(csv.reader(f))
-    if not rows:
-        return channels
-
-    header = [c.strip() for c in rows[0]] if rows and rows[0] else []
-    col_idx = None
-    if header:
-        lower_header = [h.lower() for h in header]
-        for hint in CHANNEL_HEADER_HINTS:
-            if hint in lower_header:
-                col_idx = lower_header.index(hint)
-                break
-
-    start_row = 1 if col_idx is not None else 0
-    for row in rows[start_row:]:
+    rows = reader if col_idx is not None else itertools.chain([first], reader)
+    for row in rows:
         if not row:
             continue
-        if col_idx is not None and col_idx < len(row):
-            v = (row[col_idx] or "").strip()
-            if v:
-                channels.append(v)
-        else:
-            first = next((c.strip() for c in row if c and c.strip()), "")
-            if first:
-                channels.append(first)
+        v = pick(row)
+        if v:
+            channels.append(v)
+    return channels
+
+
+def read_channels_from_csv(csv_path: str):
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return []
+    if not os.path.isfile(csv_path):
+        return []
+
+    key = os.path.abspath(csv_path)
+    cached = _CHANNELS_CACHE.get(key)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return list(cached[2])
+
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        channels = _parse_channels(f)
+    _CHANNELS_CACHE[key] = (st.st_mtime_ns, st.st_size, tuple(channels))
     return channels
 
 
@@ -62,6 +83,48 @@ def normalize_lines(s: str):
     return [ln.strip() for ln in s.splitlines() if ln.strip()]
 
 
+class AssignmentPlan:
+    """Kế hoạch dạng cột: mỗi dòng là 3 index trỏ vào bảng channels/titles/descs.
+
+    Không tạo tuple/chuỗi cho từng dòng; duyệt (iter) hoặc lấy theo index khi cần.
+    """
+
+    def __init__(self, channels, titles, descs, ch_idx, title_idx, desc_idx):
+        self.channels = channels
+        self.titles = titles
+        self.descs = descs
+        self.ch_idx = ch_idx
+        self.title_idx = title_idx
+        self.desc_idx = desc_idx
+
+    def __len__(self):
+        return len(self.title_idx)
+
+    def __getitem__(self, i):
+        return (self.channels[self.ch_idx[i]],
+                self.titles[self.title_idx[i]],
+                self.descs[self.desc_idx[i]])
+
+    def __iter__(self):
+        chs, ts, ds = self.channels, self.titles, self.descs
+        for c, t, d in zip(self.ch_idx, self.title_idx, self.desc_idx):
+            yield chs[c], ts[t], ds[d]
+
+    def iter_rows(self, directories=(), dates=(), times=()):
+        """Sinh lần lượt các dòng 6 cột (channel, directory, title, description, date, time)."""
+        nd, npd, npt = len(directories), len(dates), len(times)
+        for i, (ch, t, d) in enumerate(self):
+            yield (ch,
+                   directories[i] if i < nd else "",
+                   t, d,
+                   dates[i] if i < npd else "",
+                   times[i] if i < npt else "")
+
+
+def _cycle_idx(n, size):
+    return array("I", (i % size for i in range(n)))
+
+
 def assign_pairs(channels, titles, descs, mode="titles"):
 
     if not channels:
@@ -69,53 +132,161 @@ def assign_pairs(channels, titles, descs, mode="titles"):
     if not titles:
         raise ValueError("No titles provided.")
 
-    if len(descs) <= 1:
-        desc_cycle = itertools.cycle([descs[0] if descs else ""])
-    else:
-        desc_cycle = itertools.cycle(descs)
+    descs = list(descs) if descs else [""]
 
     if mode == "titles":
-        ch_cycle = itertools.cycle(channels)
-        out = []
-        for title in titles:
-            ch = next(ch_cycle)
-            d = next(desc_cycle)
-            out.append((ch, title, d))
-        return out
+        n = len(titles)
+        ch_idx = _cycle_idx(n, len(channels))
+        title_idx = array("I", range(n))
     else:  # mode == "channels"
-        title_cycle = itertools.cycle(titles)
-        out = []
-        for ch in channels:
-            t = next(title_cycle)
-            d = next(desc_cycle)
-            out.append((ch, t, d))
-        return out
+        n = len(channels)
+        ch_idx = array("I", range(n))
+        title_idx = _cycle_idx(n, len(titles))
+    desc_idx = _cycle_idx(n, len(descs))
+    return AssignmentPlan(channels, titles, descs, ch_idx, title_idx, desc_idx)
+
+
+def assign_quota(channels, titles, descs, start_dt, daily_cap=3, spacing_min=120):
+    """Mode "quota": chia title cho channel bằng heap (thời điểm rảnh tiếp theo, channel).
+
+    Mỗi channel đăng tối đa `daily_cap` video/ngày, 2 video liên tiếp cách nhau ít nhất
+    `spacing_min` phút; hết quota thì sang ngày hôm sau, bắt đầu lại từ giờ của `start_dt`.
+    Một lượt duy nhất, O(n log c). Trả về (plan, dates, times).
+    """
+    if not channels:
+        raise ValueError("No channels found in selected CSV.")
+    if not titles:
+        raise ValueError("No titles provided.")
+    if daily_cap < 1:
+        raise ValueError("Daily cap must be at least 1.")
+
+    descs = list(descs) if descs else [""]
+    spacing = datetime.timedelta(minutes=max(0, spacing_min))
+    start_time = start_dt.time()
+
+    heap = [(start_dt, c) for c in range(len(channels))]
+    heapq.heapify(heap)
+    day = [start_dt.date()] * len(channels)
+    used_today = [0] * len(channels)
+
+    n = len(titles)
+    ch_idx = array("I", bytes(4 * n))
+    dates, times = [], []
+    for i in range(n):
+        when, c = heapq.heappop(heap)
+        if when.date() != day[c]:
+            day[c] = when.date()
+            used_today[c] = 0
+        ch_idx[i] = c
+        dates.append(when.strftime("%m/%d/%Y"))
+        times.append(when.strftime("%H:%M"))
+        used_today[c] += 1
+
+        nxt = when + spacing
+        next_day = datetime.datetime.combine(when.date() + datetime.timedelta(days=1), start_time)
+        if used_today[c] >= daily_cap or nxt.date() != when.date():
+            nxt = max(nxt, next_day)
+        heapq.heappush(heap, (nxt, c))
+
+    plan = AssignmentPlan(channels, titles, descs, ch_idx,
+                          array("I", range(n)), _cycle_idx(n, len(descs)))
+    return plan, dates, times
+
+
+def allocate_publish_slots(channels, start_dt, step_min=0):
+    """Lịch đăng cho cả plan trong 1 lượt: lần đăng thứ k của mỗi channel = start + k*step.
+
+    Qua nửa đêm thì tự sang ngày sau. Trả về (dates, times) theo thứ tự dòng.
+    """
+    step = datetime.timedelta(minutes=max(0, step_min))
+    seen = {}
+    slots = []   # slots[k] = (date_str, time_str), dùng chung cho mọi channel
+    dates, times = [], []
+    for ch in channels:
+        k = seen.get(ch, 0)
+        seen[ch] = k + 1
+        while len(slots) <= k:
+            when = start_dt + step * len(slots)
+            slots.append((when.strftime("%m/%d/%Y"), when.strftime("%H:%M")))
+        d, t = slots[k]
+        dates.append(d)
+        times.append(t)
+    return dates, times
     
 # module.py
 def load_group_dirs(config_path=CONFIG_PATH) -> dict:
-    group_to_dir = {}
+    if config_path == CONFIG_PATH:
+        # đọc từ RAM, chỉ parse lại khi config_dir đổi mtime
+        return get_config_service().group_dirs()
     if not os.path.isfile(config_path):
-        return group_to_dir
+        return {}
     with open(config_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if ":" not in line:
-                continue
-            name, path = line.strip().split(":", 1)
-            # -- chuẩn hóa khóa: bỏ .csv
-            key = os.path.splitext(name.strip())[0]
-            # -- chuẩn hóa path
-            norm_path = os.path.abspath(path.strip().replace("\\", "/"))
-            group_to_dir[key] = norm_path
-            # (tùy chọn) giữ thêm khóa cũ để tương thích 2 chiều
-            group_to_dir[key + ".csv"] = norm_path
-    return group_to_dir
+        return normalize_group_dirs(parse_group_dirs(f.read()))
+
+
+_used_ledger = None
+_fingerprint_cache = None
+_config_service = None
+_group_catalogs = {}
+
+
+def get_config_service() -> ConfigService:
+    global _config_service
+    if _config_service is None:
+        _config_service = ConfigService(CONFIG_FILE, CONFIG_PATH)
+    return _config_service
+
+
+def get_group_catalog(groups_dir: str) -> GroupCatalog:
+    key = os.path.abspath(groups_dir)
+    catalog = _group_catalogs.get(key)
+    if catalog is None:
+        catalog = GroupCatalog(key, read_channels_from_csv, load_group_dirs, load_used_videos)
+        _group_catalogs[key] = catalog
+    return catalog
+
+
+def get_fingerprint_cache() -> FingerprintCache:
+    global _fingerprint_cache
+    if _fingerprint_cache is None:
+        _fingerprint_cache = FingerprintCache(FINGERPRINT_DB_FILE)
+    return _fingerprint_cache
+
+
+def get_used_ledger() -> UsedLedger:
+    global _used_ledger
+    if _used_ledger is None:
+        _used_ledger = UsedLedger(USED_DB_FILE, USED_LOG_FILE,
+                                  fingerprinter=get_fingerprint_cache().get_many)
+    return _used_ledger
 
 
 def load_used_videos():
-    if not os.path.exists(USED_LOG_FILE):
-        return set()
-    with open(USED_LOG_FILE, "r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+    # chỉ đọc phần mới của log.txt, set được giữ trong RAM
+    return get_used_ledger().used()
+
+
+def load_used_fingerprints():
+    return get_used_ledger().used_fingerprints()
+
+
+def plan_key(group_name: str) -> str:
+    """Khóa giữ chỗ của 1 plan: file output của group (không tính đuôi xlsx/csv/...)."""
+    base = os.path.splitext(os.path.basename(group_name))[0]
+    return os.path.normcase(os.path.abspath(os.path.join(OUTPUT_DIR, base)))
+
+
+def load_reserved_videos(group_name: str) -> set:
+    return get_used_ledger().reserved(plan_key(group_name))
+
+
+def reserve_videos(paths, group_name: str = None) -> list:
+    plan = plan_key(group_name) if group_name else None
+    return get_used_ledger().reserve(paths, plan=plan)
+
+
+def release_videos(paths):
+    get_used_ledger().release(paths)
 
 
 def get_mp4_filename(path: str) -> str:
@@ -127,25 +298,8 @@ def get_mp4_filename(path: str) -> str:
 
 
 def save_group_config(group_name: str, move_folder: str):
-    data = {}
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except:
-            data = {}
-
-    data[group_name] = move_folder
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    get_config_service().set_group_config(group_name, move_folder)
 
 def load_group_config(group_name: str) -> str:
-    if not os.path.exists(CONFIG_FILE):
-        return ""
-    try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get(group_name, "")
-    except:
-        return ""
+    return get_config_service().group_config(group_name)
     
@@ -0,0 +1,75 @@
+import datetime
+from module import (assign_pairs, assign_quota, load_group_dirs, load_used_videos,
+                    load_used_fingerprints, load_reserved_videos, get_fingerprint_cache)
+from random_vids import get_folder_index, sample_unused_mp4s
+
+
+class PreviewCancelled(Exception):
+    """Preview đã cũ (có lần gõ phím mới hơn) -> bỏ kết quả."""
+
+
+def build_preview_rows(group_key, channels, titles, descs, times, mode,
+                       is_stale=lambda: False, previous=None, quota=None):
+    """Tính toàn bộ dòng preview (chạy được ở thread nền, không đụng tới Tk).
+
+    Dòng nào giữ nguyên (channel, title, description) ở cùng vị trí so với `previous`
+    thì giữ lại video đã rút (kể cả video đã giữ chỗ cho plan của group này khi Save),
+    chỉ rút video mới cho các dòng thay đổi.
+    Mode "quota" cần `quota` = dict(start_dt, daily_cap, spacing_min); ngày/giờ đăng
+    lấy từ lịch của scheduler thay cho cột Time.
+    Trả về list[(channel, directory, title, description, publish_date, publish_time)].
+    """
+    dates = None
+    if mode == "quota":
+        assignments, dates, times = assign_quota(channels, titles, descs, **(quota or {}))
+    else:
+        assignments = assign_pairs(channels, titles, descs, mode=mode)
+    if is_stale():
+        raise PreviewCancelled()
+
+    group_dirs = load_group_dirs()
+    folder_path = group_dirs.get(group_key) or group_dirs.get(f"{group_key}.csv")
+    used_paths = load_used_videos()
+    used_fps = load_used_fingerprints()
+    # video đã giữ chỗ cho chính plan này (lần Save trước) vẫn được giữ lại ở dòng cũ
+    own_reserved = load_reserved_videos(group_key)
+    if is_stale():
+        raise PreviewCancelled()
+
+    previous = previous or []
+    directories = [""] * len(assignments)
+    kept = set()
+    # chỉ giữ video vẫn còn trong thư mục của group hiện tại
+    in_folder = get_folder_index(folder_path).file_set if folder_path else frozenset()
+    for i in range(min(len(assignments), len(previous))):
+        ch, t, d = assignments[i]
+        p_ch, p_dir, p_t, p_d = previous[i][:4]
+        if ((p_ch, p_t, p_d) == (ch, t, d) and p_dir in in_folder
+                and (p_dir not in used_paths or p_dir in own_reserved) and p_dir not in kept):
+            directories[i] = p_dir
+            kept.add(p_dir)
+
+    missing = [i for i, v in enumerate(directories) if not v]
+    if folder_path and missing:
+        fingerprints = get_fingerprint_cache().get_many
+        exclude = used_paths | kept if kept else used_paths
+        exclude_fps = used_fps
+        if kept:
+            exclude_fps = used_fps | {fp for fp in fingerprints(kept).values() if fp}
+        sampled = sample_unused_mp4s(folder_path, len(missing), exclude,
+                                     fingerprints=fingerprints, exclude_fps=exclude_fps)
+        for i, v in zip(missing, sampled):
+            directories[i] = v
+    if is_stale():
+        raise PreviewCancelled()
+
+    if dates is None:
+        today = datetime.date.today().strftime("%m/%d/%Y")
+        #if time ->> date = today
+        dates = [today if pt else "" for pt in times]
+    rows = []
+    for i, row in enumerate(assignments.iter_rows(directories, dates, times)):
+        if i % 1000 == 0 and is_stale():
+            raise PreviewCancelled()
+        rows.append(row)
+    return rows
@@ -1,18 +1,131 @@
 import os
 import random
+import threading
+
+_INDEX_CACHE = {}
+_INDEX_LOCK = threading.Lock()
+
+
+class FolderIndex:
+    """Danh sách mp4 của 1 thư mục, chỉ quét lại thư mục nào có mtime thay đổi.
+
+    recursive=True thì quét cả thư mục con (mỗi thư mục con được cache riêng).
+    """
+
+    def __init__(self, folder_path: str, recursive=False):
+        self.folder_path = os.path.abspath(folder_path)
+        self.recursive = recursive
+        self.mtime = None
+        self.files = []
+        self.file_set = frozenset()
+        self._dirs = {}  # dir -> (mtime_ns, files, subdirs)
+        self._lock = threading.Lock()
+
+    def _scan_dir(self, path, force):
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._dirs.get(path)
+        if cached and cached[0] == mtime and not force:
+            return cached, False
+
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(".mp4") and entry.is_file():
+                    files.append(os.path.abspath(entry.path))
+        cached = (mtime, files, subdirs)
+        self._dirs[path] = cached
+        return cached, True
+
+    def refresh(self, force=False) -> bool:
+        """Quét lại nếu thư mục đã đổi. Trả về True nếu index có thay đổi."""
+        with self._lock:
+            try:
+                self.mtime = os.stat(self.folder_path).st_mtime_ns
+            except OSError:
+                changed = bool(self._dirs) or bool(self.files)
+                self.mtime = None
+                self.files = []
+                self.file_set = frozenset()
+                self._dirs = {}
+                return changed
+
+            changed = False
+            visited = []
+            stack = [self.folder_path]
+            while stack:
+                path = stack.pop()
+                try:
+                    (_, _, subdirs), dir_changed = self._scan_dir(path, force)
+                except OSError:
+                    continue
+                visited.append(path)
+                changed = changed or dir_changed
+                if self.recursive:
+                    stack.extend(subdirs)
+
+            for path in set(self._dirs) - set(visited):
+                del self._dirs[path]
+                changed = True
+
+            if changed or force:
+                self.files = [f for path in visited for f in self._dirs[path][1]]
+                self.file_set = frozenset(self.files)
+            return changed
+
+
+def get_folder_index(folder_path: str, recursive=False, refresh=True) -> FolderIndex:
+    key = (os.path.normcase(os.path.abspath(folder_path)), recursive)
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(key)
+        if index is None:
+            index = FolderIndex(folder_path, recursive)
+            _INDEX_CACHE[key] = index
+    if refresh:
+        index.refresh()
+    return index
+
 
 def get_random_unused_mp4(folder_path: str, used_paths: set) -> str:
-    if not os.path.isdir(folder_path):
-        return ""
+    picked = sample_unused_mp4s(folder_path, 1, exclude=used_paths)
+    return picked[0] if picked else ""
+
+
+def sample_unused_mp4s(folder_path: str, n: int, exclude=(), fingerprints=None, exclude_fps=()) -> list:
+    """Rút n video khác nhau chưa dùng trong 1 lượt Fisher–Yates (dừng sớm khi đủ n).
 
-    all_mp4s = [
-        os.path.abspath(os.path.join(folder_path, f))
-        for f in os.listdir(folder_path)
-        if f.lower().endswith(".mp4")
-    ]
+    fingerprints (list[path] -> {path: fp}) nếu có: loại thêm video trùng nội dung với
+    exclude_fps hoặc với video đã rút (hash theo từng lô, song song).
+    Trả về ít hơn n phần tử nếu thư mục không còn đủ video.
+    """
+    if n <= 0 or not os.path.isdir(folder_path):
+        return []
 
-    unused = [f for f in all_mp4s if f not in used_paths]
-    if not unused:
-        return ""
-    return random.choice(unused)
+    files = list(get_folder_index(folder_path).files)
+    out = []
+    seen_fps = set()
+    end = len(files)
+    i = 0
+    while len(out) < n and i < end:
+        batch = []
+        while len(batch) < n - len(out) and i < end:
+            j = random.randrange(i, end)
+            files[i], files[j] = files[j], files[i]
+            cand = files[i]
+            i += 1
+            if cand not in exclude:
+                batch.append(cand)
+        if fingerprints is None:
+            out.extend(batch)
+            continue
 
+        fps = fingerprints(batch)
+        for cand in batch:
+            fp = fps.get(cand)
+            if fp is not None:
+                if fp in exclude_fps or fp in seen_fps:
+                    continue
+                seen_fps.add(fp)
+            out.append(cand)
+    return out
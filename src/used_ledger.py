@@ -0,0 +1,254 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+SOURCE_LOG = "log"
+SOURCE_RESERVE = "reserve"
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class UsedLedger:
+    """Sổ video đã dùng: SQLite (WAL) + set trong RAM.
+
+    - log.txt (do GPM ghi) được đọc nối tiếp từ offset lần trước, không đọc lại cả file.
+    - reserve() cho phép nhiều planner cùng share giữ chỗ video mà không bị trùng.
+    - fingerprinter (list[path] -> {path: fp}) nếu có: mỗi video lưu kèm fingerprint nội dung,
+      để cùng 1 clip ở 2 thư mục / 2 đường dẫn (E:\ và UNC) vẫn bị coi là đã dùng.
+    """
+
+    def __init__(self, db_path: str, log_path: str = None, owner: str = None, fingerprinter=None):
+        self.db_path = db_path
+        self.log_path = log_path
+        self.owner = owner or default_owner()
+        self.fingerprinter = fingerprinter
+        self._lock = threading.RLock()
+        self._conn = None
+        self._used = set()
+        self._used_fps = set()
+        self._plans = {}   # plan -> set path đang giữ chỗ cho plan đó
+        self._last_rowid = 0
+        self._generation = None
+
+    # ---------- sqlite ----------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS used ("
+                " path TEXT PRIMARY KEY,"
+                " source TEXT NOT NULL,"
+                " owner TEXT,"
+                " ts REAL)"
+            )
+            cols = [r[1] for r in conn.execute("PRAGMA table_info(used)")]
+            if "fp" not in cols:
+                conn.execute("ALTER TABLE used ADD COLUMN fp TEXT")
+            if "plan" not in cols:
+                conn.execute("ALTER TABLE used ADD COLUMN plan TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS used_fp ON used (fp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS used_plan ON used (plan)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+        return self._conn
+
+    def _get_meta(self, conn, key, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # ---------- log.txt tailing ----------
+    def _tail_log(self, conn):
+        if not self.log_path or not os.path.exists(self.log_path):
+            return
+        size = os.path.getsize(self.log_path)
+        offset = int(self._get_meta(conn, "log_offset", 0))
+        reset = size < offset
+        if reset:
+            # log.txt bị xóa/cắt -> import lại từ đầu, giữ nguyên các bản reserve
+            offset = 0
+        if size == offset:
+            return
+
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read(size - offset)
+        # chỉ nhận các dòng đã ghi xong (có \n), phần dở dang để lần sau
+        end = chunk.rfind(b"\n")
+        if end < 0 and not reset:
+            return
+        chunk = chunk[:end + 1]
+        paths = [ln.strip() for ln in chunk.decode("utf-8", errors="ignore").splitlines()]
+        paths = [p for p in paths if p]
+        # hash ngoài transaction để không giữ khóa ghi lâu
+        fps = self.fingerprinter(paths) if self.fingerprinter and paths else {}
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = int(self._get_meta(conn, "log_offset", 0))
+            if reset and cur > size:
+                conn.execute("DELETE FROM used WHERE source = ?", (SOURCE_LOG,))
+                self._bump_generation(conn)
+            elif cur != offset:
+                # process khác vừa import phần này rồi
+                conn.execute("COMMIT")
+                return
+
+            now = time.time()
+            promoted = conn.execute(
+                "SELECT COUNT(*) FROM used WHERE source = ? AND path IN (SELECT value FROM json_each(?))",
+                (SOURCE_RESERVE, json.dumps(paths)),
+            ).fetchone()[0]
+            # video đã giữ chỗ mà GPM vừa đăng -> chuyển thành 'log' để Save sau không trả nó lại
+            conn.executemany(
+                "INSERT INTO used (path, source, owner, ts, fp) VALUES (?, ?, NULL, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET source = excluded.source, owner = NULL, plan = NULL,"
+                " fp = COALESCE(used.fp, excluded.fp)",
+                [(p, SOURCE_LOG, now, fps.get(p)) for p in paths],
+            )
+            if promoted:
+                # rowid không đổi -> báo các instance dựng lại set giữ chỗ theo plan
+                self._bump_generation(conn)
+            self._set_meta(conn, "log_offset", offset + len(chunk))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _bump_generation(self, conn):
+        gen = int(self._get_meta(conn, "generation", 0)) + 1
+        self._set_meta(conn, "generation", gen)
+
+    def _pull_new_rows(self, conn):
+        gen = self._get_meta(conn, "generation", "0")
+        if gen != self._generation:
+            self._used = set()
+            self._used_fps = set()
+            self._plans = {}
+            self._last_rowid = 0
+            self._generation = gen
+        rows = conn.execute(
+            "SELECT rowid, path, fp, source, plan FROM used WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)
+        ).fetchall()
+        for rowid, path, fp, source, plan in rows:
+            self._used.add(path)
+            if fp:
+                self._used_fps.add(fp)
+            if plan and source == SOURCE_RESERVE:
+                self._plans.setdefault(plan, set()).add(path)
+            self._last_rowid = rowid
+
+    # ---------- public ----------
+    def refresh(self):
+        with self._lock:
+            conn = self._db()
+            self._tail_log(conn)
+            self._pull_new_rows(conn)
+
+    def used(self) -> set:
+        """Set các path đã dùng/đã giữ chỗ (chỉ đọc, không sửa trực tiếp)."""
+        self.refresh()
+        return self._used
+
+    def used_fingerprints(self) -> set:
+        self.refresh()
+        return self._used_fps
+
+    def reserved(self, plan: str) -> set:
+        """Set path đang giữ chỗ cho `plan` (chỉ đọc)."""
+        self.refresh()
+        return self._plans.get(plan, set())
+
+    def __contains__(self, path) -> bool:
+        return path in self._used
+
+    def reserve(self, paths, owner: str = None, plan: str = None) -> list:
+        """Giữ chỗ các video (tất cả hoặc không gì cả).
+
+        plan (vd. file output của 1 group) nếu có: lần giữ chỗ này thay cho lần trước của cùng
+        plan — video của plan cũ không còn trong `paths` được trả lại, video trùng thì dùng tiếp.
+        Trả về list path đã bị planner/plan khác giữ/dùng trước đó; rỗng nếu giữ chỗ thành công.
+        """
+        owner = owner or self.owner
+        paths = [p for p in dict.fromkeys(paths) if p]
+        if not paths and plan is None:
+            return []
+        fps = self.fingerprinter(paths) if self.fingerprinter and paths else {}
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conflicts = []
+                now = time.time()
+                for p in paths:
+                    fp = fps.get(p)
+                    rows = conn.execute(
+                        "SELECT path, source, owner, plan FROM used WHERE path = ? OR (fp IS NOT NULL AND fp = ?)",
+                        (p, fp),
+                    ).fetchall()
+                    if any(not self._reusable(src, own, pl, owner, plan) for _, src, own, pl in rows):
+                        conflicts.append(p)
+                    elif not any(path == p for path, _, _, _ in rows):
+                        conn.execute(
+                            "INSERT INTO used (path, source, owner, ts, fp, plan) VALUES (?, ?, ?, ?, ?, ?)",
+                            (p, SOURCE_RESERVE, owner, now, fp, plan),
+                        )
+                if conflicts:
+                    conn.execute("ROLLBACK")
+                    return conflicts
+                if plan is not None:
+                    keep = set(paths)
+                    stale = [(path, SOURCE_RESERVE) for (path,) in conn.execute(
+                        "SELECT path FROM used WHERE source = ? AND plan = ?", (SOURCE_RESERVE, plan)
+                    ) if path not in keep]
+                    if stale:
+                        conn.executemany("DELETE FROM used WHERE path = ? AND source = ?", stale)
+                        self._bump_generation(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._pull_new_rows(conn)
+        return []
+
+    @staticmethod
+    def _reusable(source, row_owner, row_plan, owner, plan) -> bool:
+        if source != SOURCE_RESERVE:
+            return False
+        if plan is not None:
+            return row_plan == plan
+        return row_owner == owner and row_plan is None
+
+    def release(self, paths, owner: str = None):
+        owner = owner or self.owner
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "DELETE FROM used WHERE path = ? AND source = ? AND owner = ?",
+                    [(p, SOURCE_RESERVE, owner) for p in paths if p],
+                )
+                self._bump_generation(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._pull_new_rows(conn)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
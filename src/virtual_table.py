@@ -0,0 +1,165 @@
+import tkinter as tk
+from tkinter import ttk
+
+_SHIFT_MASK = 0x0001
+_CONTROL_MASK = 0x0004
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview ảo: dữ liệu nằm ở list `rows`, chỉ tạo item Tk cho các dòng đang hiển thị.
+
+    Chọn dòng, cuộn, double-click... đều làm việc theo index của `rows` (model index).
+    """
+
+    def __init__(self, master, columns, **kw):
+        super().__init__(master, **kw)
+        self.rows = []
+        self.top = 0
+        self.selected = set()
+        self.cursor = None
+        self._visible = 1
+        self._items = []   # iid của các dòng đang hiển thị
+        self._shown = []   # values đang hiển thị ở từng iid (tránh update thừa)
+        self._pos = {}     # iid -> vị trí trong cửa sổ
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=1, selectmode="extended")
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.vsb.pack(side=tk.LEFT, fill=tk.Y)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<ButtonPress-1>", self._on_click)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+        self.tree.bind("<Up>", lambda e: self._move_cursor(-1))
+        self.tree.bind("<Down>", lambda e: self._move_cursor(1))
+        self.tree.bind("<Prior>", lambda e: self._move_cursor(-self._visible))
+        self.tree.bind("<Next>", lambda e: self._move_cursor(self._visible))
+        self.tree.bind("<Home>", lambda e: self._move_cursor(-len(self.rows)))
+        self.tree.bind("<End>", lambda e: self._move_cursor(len(self.rows)))
+
+    # ---------- model API ----------
+    def set_rows(self, rows):
+        self.rows = rows
+        n = len(rows)
+        self.selected = {i for i in self.selected if i < n}
+        if self.cursor is not None and self.cursor >= n:
+            self.cursor = None
+        self._render()
+
+    def refresh(self):
+        self._render()
+
+    def index_at(self, y):
+        k = self._pos.get(self.tree.identify_row(y))
+        return None if k is None else self.top + k
+
+    def selection_indices(self):
+        return sorted(self.selected)
+
+    def select(self, indices):
+        self.selected = set(indices)
+        self._render()
+
+    def see(self, index):
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self._visible:
+            self.top = index - self._visible + 1
+        self._render()
+
+    # ---------- render ----------
+    def _row_height(self):
+        try:
+            return int(ttk.Style(self).lookup("Treeview", "rowheight")) or 20
+        except (ValueError, tk.TclError):
+            return 20
+
+    def _render(self):
+        n = len(self.rows)
+        self.top = max(0, min(self.top, n - self._visible))
+        count = max(0, min(self._visible, n - self.top))
+
+        if len(self._items) != count:
+            while len(self._items) < count:
+                self._items.append(self.tree.insert("", tk.END, values=()))
+                self._shown.append(None)
+            if len(self._items) > count:
+                self.tree.delete(*self._items[count:])
+                del self._items[count:]
+                del self._shown[count:]
+            self._pos = {iid: k for k, iid in enumerate(self._items)}
+
+        for k in range(count):
+            row = self.rows[self.top + k]
+            if self._shown[k] != row:
+                self.tree.item(self._items[k], values=row)
+                self._shown[k] = row
+
+        sel = [self._items[k] for k in range(count) if self.top + k in self.selected]
+        if tuple(sel) != self.tree.selection():
+            self.tree.selection_set(sel)
+        if self.cursor is not None and 0 <= self.cursor - self.top < count:
+            self.tree.focus(self._items[self.cursor - self.top])
+
+        if n:
+            self.vsb.set(self.top / n, (self.top + count) / n)
+        else:
+            self.vsb.set(0, 1)
+
+    # ---------- events ----------
+    def _on_resize(self, event):
+        # trừ 1 dòng cho heading
+        visible = max(1, event.height // self._row_height() - 1)
+        if visible != self._visible:
+            self._visible = visible
+            self._render()
+
+    def _on_click(self, event):
+        # click thường thay cả vùng chọn (kể cả dòng đã chọn nhưng đang cuộn khuất);
+        # Ctrl/Shift-click thì giữ các dòng khuất như cũ
+        if event.state & (_SHIFT_MASK | _CONTROL_MASK):
+            return
+        index = self.index_at(event.y)
+        if index is not None:
+            self.selected = {index}
+
+    def _on_select(self, event=None):
+        count = len(self._items)
+        window = range(self.top, self.top + count)
+        outside = {i for i in self.selected if i not in window}
+        inside = {self.top + self._pos[iid] for iid in self.tree.selection() if iid in self._pos}
+        self.selected = outside | inside
+        k = self._pos.get(self.tree.focus())
+        if k is not None:
+            self.cursor = self.top + k
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._visible
+            self.top += step
+        self._render()
+
+    def _on_wheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _scroll_by(self, step):
+        self.top += step
+        self._render()
+        return "break"
+
+    def _move_cursor(self, step):
+        if not self.rows:
+            return "break"
+        cur = self.cursor if self.cursor is not None else self.top
+        cur = max(0, min(len(self.rows) - 1, cur + step))
+        self.cursor = cur
+        self.selected = {cur}
+        self.see(cur)
+        return "break"